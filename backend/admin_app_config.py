@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import functools
+import hashlib
 import json
+import os
+import shutil
+import threading
 import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 
+try:
+    import orjson  # type: ignore
+except Exception:  # orjson is optional: fall back to stdlib json
+    orjson = None
+
 
 @dataclass(frozen=True)
 class AdminAppConfig:
@@ -20,31 +30,67 @@ class AdminAppConfig:
     updated_at: str = ""
 
     def to_dict(self) -> Dict[str, Any]:
-        return {
-            "forced_generation_text": self.forced_generation_text,
-            "gemini_model_default": self.gemini_model_default,
-            "chat_model_default": self.chat_model_default,
-            "elevenlabs_voice_id_default": self.elevenlabs_voice_id_default,
-            "safety_rules_text": self.safety_rules_text,
-            "prompt_template_override": self.prompt_template_override,
-            "updated_at": self.updated_at,
-        }
+        # Frozen instance => the fields never change: build the dict once, hand out shallow copies
+        # (all values are str, so a copy is a cheap dict clone and callers can't alter the cache).
+        d = self.__dict__.get("_dict_cache")
+        if d is None:
+            d = {
+                "forced_generation_text": self.forced_generation_text,
+                "gemini_model_default": self.gemini_model_default,
+                "chat_model_default": self.chat_model_default,
+                "elevenlabs_voice_id_default": self.elevenlabs_voice_id_default,
+                "safety_rules_text": self.safety_rules_text,
+                "prompt_template_override": self.prompt_template_override,
+                "updated_at": self.updated_at,
+            }
+            object.__setattr__(self, "_dict_cache", d)
+        return dict(d)
+
+
+# Shared default (frozen, so safe to hand out to every caller/thread).
+_EMPTY_CONFIG = AdminAppConfig()
+
+
+# Last formatted second (a racing thread at worst recomputes the same string).
+_LAST_SEC = 0
+_LAST_STR = ""
 
 
 def _now_iso() -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    global _LAST_SEC, _LAST_STR
+    t = int(time.time())
+    if t != _LAST_SEC:
+        _LAST_STR = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(t))
+        _LAST_SEC = t
+    return _LAST_STR
+
+
+def _json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
+def _json_dumps(obj: Any, *, indent: bool = False) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+@functools.lru_cache(maxsize=1)
 def _base_dir() -> Path:
     return Path(__file__).resolve().parent.parent
 
 
+@functools.lru_cache(maxsize=1)
 def _config_dir() -> Path:
+    # Created once per process; the paths are constant for the process lifetime.
     d = _base_dir() / "assets" / "state"
     d.mkdir(parents=True, exist_ok=True)
     return d
 
 
+@functools.lru_cache(maxsize=1)
 def _paths() -> Tuple[Path, Path, Path]:
     d = _config_dir()
     return (
@@ -54,79 +100,170 @@ def _paths() -> Tuple[Path, Path, Path]:
     )
 
 
+def _fsync_dir(d: Path) -> None:
+    # Persist the rename itself (directory entry). Not available on Windows.
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    dfd = os.open(str(d), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(dfd)
+    finally:
+        os.close(dfd)
+
+
+def _write_durable(path: Path, data: bytes) -> None:
+    """
+    Durable atomic write:
+    - write + fsync a temp file next to the target (same filesystem)
+    - os.replace() it over the target
+    - fsync the parent directory so the rename survives a crash
+    """
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    try:
+        os.unlink(tmp)  # stale temp file from an interrupted save
+    except FileNotFoundError:
+        pass
+    fd = os.open(str(tmp), os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(fd, view):]
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+    os.replace(tmp, path)
+    try:
+        _fsync_dir(path.parent)
+    except OSError:
+        pass
+
+
+_NUL_REMOVE = str.maketrans("", "", "\x00")
+
+
 def _sanitize_text(s: str) -> str:
-    s = (s or "").replace("\x00", "").strip()
+    s = (s or "").translate(_NUL_REMOVE).strip()
     # Keep it reasonably small to avoid prompt explosions / accidental paste of secrets.
-    if len(s) > 8000:
-        s = s[:8000]
-    return s
+    return s if len(s) <= 8000 else s[:8000]
 
 
 def _sanitize_short(s: str, *, max_len: int = 128) -> str:
-    s = (s or "").replace("\x00", "").strip()
-    if len(s) > max_len:
-        s = s[:max_len]
-    return s
+    s = (s or "").translate(_NUL_REMOVE).strip()
+    return s if len(s) <= max_len else s[:max_len]
+
+
+_MISSING = object()
+
+# (field, sanitizer, max_len) for every admin-editable field; max_len=None => sanitizer default.
+_FIELDS = (
+    ("forced_generation_text", _sanitize_text, None),
+    ("gemini_model_default", _sanitize_short, 64),
+    ("chat_model_default", _sanitize_short, 64),
+    ("elevenlabs_voice_id_default", _sanitize_short, 128),
+    ("safety_rules_text", _sanitize_text, None),
+    ("prompt_template_override", _sanitize_text, None),
+)
+
+
+def _parse_raw(raw: Dict[str, Any]) -> AdminAppConfig:
+    g = raw.get
+    kwargs: Dict[str, str] = {}
+    for name, sanitize, max_len in _FIELDS:
+        v = str(g(name) or "")
+        kwargs[name] = sanitize(v) if max_len is None else sanitize(v, max_len=max_len)
+    return AdminAppConfig(**kwargs, updated_at=str(g("updated_at") or ""))
 
 
 def _merge_config(prev: AdminAppConfig, updates: Dict[str, Any]) -> AdminAppConfig:
     u = updates or {}
-    return AdminAppConfig(
-        forced_generation_text=_sanitize_text(str(u.get("forced_generation_text") if u.get("forced_generation_text") is not None else prev.forced_generation_text)),
-        gemini_model_default=_sanitize_short(
-            str(u.get("gemini_model_default") if u.get("gemini_model_default") is not None else prev.gemini_model_default),
-            max_len=64,
-        ),
-        chat_model_default=_sanitize_short(
-            str(u.get("chat_model_default") if u.get("chat_model_default") is not None else prev.chat_model_default),
-            max_len=64,
-        ),
-        elevenlabs_voice_id_default=_sanitize_short(
-            str(u.get("elevenlabs_voice_id_default") if u.get("elevenlabs_voice_id_default") is not None else prev.elevenlabs_voice_id_default),
-            max_len=128,
-        ),
-        safety_rules_text=_sanitize_text(str(u.get("safety_rules_text") if u.get("safety_rules_text") is not None else prev.safety_rules_text)),
-        prompt_template_override=_sanitize_text(
-            str(u.get("prompt_template_override") if u.get("prompt_template_override") is not None else prev.prompt_template_override)
-        ),
-        updated_at=_now_iso(),
-    )
+    kwargs: Dict[str, str] = {}
+    for name, sanitize, max_len in _FIELDS:
+        v = u.get(name, _MISSING)
+        if v is _MISSING or v is None:
+            # prev was sanitized when it was built: reuse it as-is.
+            kwargs[name] = getattr(prev, name)
+        else:
+            kwargs[name] = sanitize(str(v)) if max_len is None else sanitize(str(v), max_len=max_len)
+    return AdminAppConfig(**kwargs, updated_at=_now_iso())
 
 
-# Small in-process cache
-_CACHE: Dict[str, Any] = {"at": 0.0, "data": None}
+# Small in-process cache, keyed by the config file's (st_mtime_ns, st_size):
+# a changed file (even from another process) is picked up on the next call.
+class _Cache:
+    __slots__ = ("key", "data")
 
+    def __init__(self) -> None:
+        self.key: Optional[Tuple[int, int]] = None
+        self.data: Optional[AdminAppConfig] = None
 
-def load_admin_app_config(*, cache_ttl_s: int = 10) -> AdminAppConfig:
-    now = time.time()
-    cached = _CACHE.get("data")
-    if cached and (now - float(_CACHE.get("at") or 0)) < max(1, int(cache_ttl_s)):
-        return cached
 
-    cfg_path, _prev, _hist = _paths()
-    if not cfg_path.exists():
-        cfg = AdminAppConfig()
-        _CACHE["at"] = now
-        _CACHE["data"] = cfg
-        return cfg
+_CACHE = _Cache()
+
+
+# Parsed configs keyed by the SHA-256 of their serialized bytes (small FIFO):
+# a save->load round-trip or a re-read of unchanged bytes skips json parsing.
+_PARSED_BY_HASH: Dict[bytes, AdminAppConfig] = {}
+_PARSED_BY_HASH_MAX = 8
+# load (under _LOAD_LOCK) and save (outside it) both touch the FIFO: every get/evict/insert holds this lock.
+_PARSED_LOCK = threading.Lock()
+
+_MAX_HISTORY_BYTES = 1024 * 1024
 
+
+def _remember_parsed(digest: bytes, cfg: AdminAppConfig) -> None:
+    with _PARSED_LOCK:
+        _PARSED_BY_HASH.pop(digest, None)
+        while len(_PARSED_BY_HASH) >= _PARSED_BY_HASH_MAX:
+            _PARSED_BY_HASH.pop(next(iter(_PARSED_BY_HASH)), None)
+        _PARSED_BY_HASH[digest] = cfg
+
+
+def _stat_key(path: Path) -> Optional[Tuple[int, int]]:
     try:
-        raw = json.loads(cfg_path.read_text(encoding="utf-8"))
-        cfg = AdminAppConfig(
-            forced_generation_text=_sanitize_text(str(raw.get("forced_generation_text") or "")),
-            gemini_model_default=_sanitize_short(str(raw.get("gemini_model_default") or ""), max_len=64),
-            chat_model_default=_sanitize_short(str(raw.get("chat_model_default") or ""), max_len=64),
-            elevenlabs_voice_id_default=_sanitize_short(str(raw.get("elevenlabs_voice_id_default") or ""), max_len=128),
-            safety_rules_text=_sanitize_text(str(raw.get("safety_rules_text") or "")),
-            prompt_template_override=_sanitize_text(str(raw.get("prompt_template_override") or "")),
-            updated_at=str(raw.get("updated_at") or ""),
-        )
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _read_config(cfg_path: Path, key: Optional[Tuple[int, int]]) -> AdminAppConfig:
+    if key is None:
+        return _EMPTY_CONFIG
+    try:
+        data = cfg_path.read_bytes()
+        digest = hashlib.sha256(data).digest()
+        with _PARSED_LOCK:
+            hit = _PARSED_BY_HASH.get(digest)
+        if hit is not None:
+            return hit
+        cfg = _parse_raw(_json_loads(data))
+        _remember_parsed(digest, cfg)
+        return cfg
     except Exception:
-        cfg = AdminAppConfig()
+        return _EMPTY_CONFIG
 
-    _CACHE["at"] = now
-    _CACHE["data"] = cfg
-    return cfg
+
+# Single-flight: only one thread reads/parses on a cache miss, the others reuse its result.
+_LOAD_LOCK = threading.Lock()
+
+
+def load_admin_app_config(*, cache_ttl_s: int = 10) -> AdminAppConfig:
+    # cache_ttl_s is kept for backward compatibility: 0 forces a re-read,
+    # any other value relies on stat-based invalidation.
+    cfg_path, _prev, _hist = _paths()
+    key = _stat_key(cfg_path)
+    cached = _CACHE.data
+    if cached is not None and cache_ttl_s and key == _CACHE.key:
+        return cached
+
+    with _LOAD_LOCK:
+        cached = _CACHE.data
+        if cached is not None and cache_ttl_s and key == _CACHE.key:
+            return cached
+        cfg = _read_config(cfg_path, key)
+        _CACHE.data = cfg
+        _CACHE.key = key
+        return cfg
 
 
 def save_admin_app_config(updates: Dict[str, Any]) -> AdminAppConfig:
@@ -134,49 +271,76 @@ def save_admin_app_config(updates: Dict[str, Any]) -> AdminAppConfig:
     Save config with rollback protection:
     - write previous config to *.prev.json
     - append an audit line to history.jsonl
-    - atomic write via temp file then replace
+    - durable atomic write via fsynced temp file then replace
+    A save that changes no field is a no-op: nothing is written and updated_at is not bumped.
     """
     cfg_path, prev_path, hist_path = _paths()
 
-    prev = load_admin_app_config(cache_ttl_s=0)
+    # Single stat: serves both the "is there a file to back up" check and the re-read.
+    cfg_key = _stat_key(cfg_path)
+    prev = _read_config(cfg_path, cfg_key)
     next_cfg = _merge_config(prev, updates or {})
+    if all(getattr(next_cfg, name) == getattr(prev, name) for name, _s, _m in _FIELDS):
+        return prev
 
-    # Backup previous config (best effort)
+    # Backup previous config (best effort): hardlink the current inode, which the
+    # atomic replace below leaves untouched. Fall back to a copy if links are unsupported.
     try:
-        if cfg_path.exists():
-            prev_path.write_text(cfg_path.read_text(encoding="utf-8"), encoding="utf-8")
+        if cfg_key is not None:
+            try:
+                os.unlink(prev_path)
+            except FileNotFoundError:
+                pass
+            try:
+                os.link(cfg_path, prev_path)
+            except OSError:
+                shutil.copyfile(cfg_path, prev_path)
     except Exception:
         pass
 
-    # Atomic write
-    tmp = cfg_path.with_suffix(".json.tmp")
-    tmp.write_text(json.dumps(next_cfg.to_dict(), ensure_ascii=False, indent=2), encoding="utf-8")
-    tmp.replace(cfg_path)
+    # Durable atomic write
+    data = _json_dumps(next_cfg.to_dict(), indent=True)
+    _write_durable(cfg_path, data)
+    # The file is already replaced: a cache hiccup must not turn the save into an error.
+    try:
+        _remember_parsed(hashlib.sha256(data).digest(), next_cfg)
+    except Exception:
+        pass
 
-    # Append history line (best effort)
+    # Append history line (best effort): one write() on an O_APPEND fd keeps lines whole.
+    # Kept as compact JSONL on purpose: it is a human-readable audit trail and rows are tiny.
     try:
-        hist_path.parent.mkdir(parents=True, exist_ok=True)
-        with hist_path.open("a", encoding="utf-8") as f:
-            f.write(json.dumps({"at": next_cfg.updated_at, **next_cfg.to_dict()}, ensure_ascii=False) + "\n")
+        row = {"at": next_cfg.updated_at, **next_cfg.to_dict()}
+        fd = os.open(str(hist_path), os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.write(fd, _json_dumps(row) + b"\n")
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        # Rotate (keep one previous generation) so the log cannot grow unbounded.
+        if size > _MAX_HISTORY_BYTES:
+            os.replace(hist_path, hist_path.with_name(hist_path.name + ".1"))
     except Exception:
         pass
 
-    _CACHE["at"] = time.time()
-    _CACHE["data"] = next_cfg
+    _CACHE.data = next_cfg
+    _CACHE.key = _stat_key(cfg_path)
     return next_cfg
 
 
 def rollback_admin_app_config() -> AdminAppConfig:
     cfg_path, prev_path, _hist = _paths()
-    if not prev_path.exists():
-        return load_admin_app_config(cache_ttl_s=0)
     try:
-        # Restore previous
-        cfg_path.write_text(prev_path.read_text(encoding="utf-8"), encoding="utf-8")
-    except Exception:
+        # Restore previous: atomically move the backup over the current config
+        # (the backup is consumed; a second rollback is a no-op).
+        os.replace(prev_path, cfg_path)
+        _fsync_dir(cfg_path.parent)
+    except FileNotFoundError:
+        return load_admin_app_config(cache_ttl_s=0)
+    except OSError:
         pass
-    _CACHE["at"] = 0.0
-    _CACHE["data"] = None
+    _CACHE.data = None
+    _CACHE.key = None
     return load_admin_app_config(cache_ttl_s=0)
 
 
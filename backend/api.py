@@ -1,13 +1,24 @@
-﻿import os
+﻿import asyncio
+import base64
+import functools
+import json
+import logging
+import os
+import re
 import secrets
 import shutil
 import sys
 import time
 import traceback
+import zipfile
+from enum import Enum
+from pathlib import Path
+from typing import Any, Optional
 
 from binaural import generate_binaural_track
-from cache import save_cached, stable_cache_key, try_load_cached
+from cache import canonical_json, hash_key, save_cached, try_load_cached
 from db import (
+    count_audio_assets_by_tags,
     db_enabled,
     get_client_state,
     get_user_state,
@@ -23,10 +34,10 @@ from db import (
     list_audio_assets,
     delete_audio_asset,
 )
-from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, BackgroundTasks, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
 from llm import DEFAULT_SECTIONS, debug_ollama_once
-from llm_gemini import list_gemini_models
+from llm_gemini import _redact_secrets, list_gemini_models
 from llm_router import generate_sections
 from mixdown import MixSettings, mixdown_to_wav
 from models import (
@@ -39,7 +50,10 @@ from models import (
 )
 from music import generate_music_bed
 from prompts import build_prompt_with_overrides
+import run_index
+import state_writer
 from tts import synthesize_tts_cached
+from utils import copy_file_fast
 from urllib.parse import urlparse
 from supabase_storage import (
     build_default_catalog,
@@ -51,11 +65,88 @@ from supabase_storage import (
     storage_enabled,
     upload_object,
 )
-from supabase_auth import get_current_user
+from supabase_auth import SupabaseUser, get_current_user
 from admin_app_config import load_admin_app_config, rollback_admin_app_config, save_admin_app_config, reset_admin_app_config
 from llm_gemini import chat_gemini
 
-router = APIRouter()
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+logger = logging.getLogger("hypnotic_ai.api")
+
+# orjson sérialise 2-5x plus vite que json (stdlib); fallback si non installé.
+router = APIRouter(default_response_class=ORJSONResponse if orjson is not None else JSONResponse)
+
+
+def _loads(raw: bytes):
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _dumps_indent(obj) -> bytes:
+    if orjson is not None:
+        # OPT_NON_STR_KEYS: mêmes dicts acceptés que json.dumps (clés int, etc.)
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def _dumps_line(obj) -> bytes:
+    """Une ligne JSONL compacte (bytes, saut de ligne final inclus)."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def _bulk_write(files: list) -> None:
+    """Écrit [(path, bytes), ...]: un open + un write par fichier, sans objet fichier Python."""
+    flags = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+    for path, data in files:
+        fd = os.open(path, flags, 0o644)
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view) :]
+        finally:
+            os.close(fd)
+
+
+async def _read_json(request: Request):
+    """Parse le body JSON (orjson si dispo, sinon json stdlib)."""
+    return _loads(await request.body())
+
+
+@functools.lru_cache(maxsize=4096)
+def _load_json_file_cached(path: str, mtime_ns: int, size: int):
+    with open(path, "rb") as f:
+        return _loads(f.read())
+
+
+def _read_json_file(path: str, default=None):
+    """
+    JSON d'un fichier de run, re-parsé seulement si (mtime, taille) a changé.
+    Le résultat est partagé entre requêtes: ne pas le muter.
+    """
+    try:
+        st = os.stat(path)
+        return _load_json_file_cached(path, st.st_mtime_ns, st.st_size)
+    except Exception:
+        return default
+
+
+# Feedback local (fallback sans DB): chemins calculés une fois à l'import.
+_BASE_DIR = Path(__file__).resolve().parent.parent
+_FB_DIR = _BASE_DIR / "assets" / "feedback"
+_FB_PATH = _FB_DIR / "wellbeing.jsonl"
+_FB_DIR.mkdir(parents=True, exist_ok=True)
+_STATE_DIR = _BASE_DIR / "assets" / "state"
+_STATE_DIR.mkdir(parents=True, exist_ok=True)
+_RUNS_DIR = _BASE_DIR / "assets" / "runs"
+_RUNS_DIR.mkdir(parents=True, exist_ok=True)
+# Copies "latest" (assets/audio/session.wav, ...): debug uniquement, désactivées par défaut.
+_WRITE_LEGACY_LATEST = (os.environ.get("ZEN_LEGACY_LATEST") or "").strip() == "1"
 
 # User-facing playlists (Spotify-like): we build themed playlists from audio_assets tags.
 # Tags are stored canonically in EN (e.g., sleep/relax/rain/ocean/fire).
@@ -71,6 +162,7 @@ PLAYLIST_THEMES = [
     {"tag": "wind", "title": "Vent", "subtitle": "Vent, souffle, air", "kind": "ambience"},
     {"tag": "zen", "title": "Zen", "subtitle": "SÃ©lection zen (mix)", "kind": "ambience"},
 ]
+PLAYLIST_THEMES_BY_TAG = {str(p["tag"]).lower(): p for p in PLAYLIST_THEMES}
 
 def _require_admin(request: Request) -> None:
     """
@@ -85,21 +177,31 @@ def _require_admin(request: Request) -> None:
     if not provided or not secrets.compare_digest(provided, required):
         raise HTTPException(status_code=401, detail="Unauthorized")
 
-def _redact_secrets(s: str) -> str:
-    """
-    EmpÃªche les erreurs renvoyÃ©es au frontend (llm_error/tts_error/etc) de contenir des secrets
-    (ex: URL avec ?key=...).
-    """
-    if not s:
-        return s
-    try:
-        import re
 
-        s = re.sub(r"([?&]key=)[^&\s]+", r"\1REDACTED", s)
-        s = re.sub(r"AIza[0-9A-Za-z\-_]{20,}", "AIzaREDACTED", s)
-    except Exception:
-        pass
-    return s
+def _enum_val(x: Any, default: str = "") -> str:
+    """Enum -> .value, sinon str(x) (ou default si vide)."""
+    if isinstance(x, Enum):
+        return str(x.value)
+    return str(x or default)
+
+
+# Beats "typiques" (au milieu de chaque bande)
+_BAND_TO_BEAT = {
+    "delta": 2.0,
+    "theta": 6.0,
+    "alpha": 10.0,
+    "beta": 18.0,
+    "gamma": 40.0,
+}
+
+# Auto: mapping simple par objectif (enum)
+_OBJ_TO_BAND = {
+    "sommeil": ("delta", _BAND_TO_BEAT["delta"]),
+    "stress": ("alpha", _BAND_TO_BEAT["alpha"]),
+    "confiance": ("alpha", _BAND_TO_BEAT["alpha"]),
+    "performance": ("gamma", _BAND_TO_BEAT["gamma"]),
+    "douleur": ("delta", _BAND_TO_BEAT["delta"]),
+}
 
 
 def _pick_binaural_band_and_beat(request: GenerationRequest) -> tuple[str, float]:
@@ -116,49 +218,46 @@ def _pick_binaural_band_and_beat(request: GenerationRequest) -> tuple[str, float
     - Beta: 13-30 Hz (concentration)
     - Gamma: >30 Hz (performance/flow)
     """
-    beat_override = float(getattr(request, "binaural_beat_hz", 0.0) or 0.0)
+    beat_override = float(request.binaural_beat_hz or 0.0)
     if beat_override > 0.0:
-        band = str(getattr(request, "binaural_band", "custom"))
-        return (band, beat_override)
-
-    band = getattr(request, "binaural_band", None)
-    band_value = getattr(band, "value", str(band or "auto"))
-
-    # Beats "typiques" (au milieu de chaque bande)
-    band_to_beat = {
-        "delta": 2.0,
-        "theta": 6.0,
-        "alpha": 10.0,
-        "beta": 18.0,
-        "gamma": 40.0,
-    }
+        return (_enum_val(request.binaural_band, "custom"), beat_override)
+
+    band_value = _enum_val(request.binaural_band, "auto")
+    beat = _BAND_TO_BEAT.get(band_value)
+    if beat is not None:
+        return (band_value, beat)
 
-    if band_value in band_to_beat:
-        return (band_value, band_to_beat[band_value])
-
-    # Auto: mapping simple par objectif (enum)
-    obj = getattr(request, "objectif", None)
-    obj_value = getattr(obj, "value", str(obj or "")).lower()
-    if obj_value == "sommeil":
-        return ("delta", band_to_beat["delta"])
-    if obj_value == "stress":
-        return ("alpha", band_to_beat["alpha"])
-    if obj_value == "confiance":
-        return ("alpha", band_to_beat["alpha"])
-    if obj_value == "performance":
-        return ("gamma", band_to_beat["gamma"])
-    if obj_value == "douleur":
-        return ("delta", band_to_beat["delta"])
-
-    # Fallback
-    return ("theta", band_to_beat["theta"])
+    obj_value = _enum_val(request.objectif).lower()
+    # Fallback: theta
+    return _OBJ_TO_BAND.get(obj_value, ("theta", _BAND_TO_BEAT["theta"]))
 
 @router.get("/debug/ollama")
 async def debug_ollama():
     return await debug_ollama_once()
 
+
+@functools.lru_cache(maxsize=4)
+def _parse_cors_origins(cors_env: str) -> tuple[str, ...]:
+    return tuple(o.strip() for o in cors_env.split(",") if o.strip())
+
+
+@functools.lru_cache(maxsize=4)
+def _compute_vercel_preview_regex(cors_env: str) -> Optional[str]:
+    """Mirror the Vercel-preview regex logic from main.py (cached per CORS_ORIGINS value)."""
+    vercel_hosts = []
+    for o in _parse_cors_origins(cors_env):
+        host = (urlparse(o).hostname or "").lower()
+        if host.endswith(".vercel.app"):
+            base = host[: -len(".vercel.app")]
+            if base:
+                vercel_hosts.append(re.escape(base))
+    if not vercel_hosts:
+        return None
+    return rf"^https://(?:{'|'.join(vercel_hosts)})(?:-[a-z0-9-]+)*\.vercel\.app$"
+
+
 @router.get("/debug/env")
-def debug_env():
+async def debug_env():
     """
     Debug: confirme si les variables d'environnement sont visibles par le process backend.
     Ne renvoie jamais les valeurs (sÃ©curitÃ©), seulement True/False.
@@ -172,8 +271,6 @@ def debug_env():
     except Exception:
         psycopg_ok = False
         try:
-            import traceback
-
             psycopg_err = traceback.format_exc(limit=2)
         except Exception:
             psycopg_err = "import failed"
@@ -186,10 +283,7 @@ def debug_env():
     host = None
     try:
         if db_url:
-            from urllib.parse import urlparse
-
-            u = urlparse(db_url)
-            host = u.hostname
+            host = urlparse(db_url).hostname
     except Exception:
         host = None
 
@@ -199,7 +293,8 @@ def debug_env():
         if host:
             import socket
 
-            socket.getaddrinfo(host, None)
+            # Blocking resolver call: run it in a worker thread, not on the event loop.
+            await asyncio.to_thread(socket.getaddrinfo, host, None)
             dns_ok = True
         elif db_url:
             dns_ok = False
@@ -209,23 +304,9 @@ def debug_env():
         dns_err = str(e)
 
     cors_env = (os.environ.get("CORS_ORIGINS") or "").strip()
-    allow_origins = [o.strip() for o in cors_env.split(",") if o.strip()] if cors_env else []
-    cors_preview_regex = None
+    allow_origins = list(_parse_cors_origins(cors_env))
     try:
-        # Mirror the Vercel-preview regex logic from main.py (debug only)
-        from urllib.parse import urlparse
-        import re
-
-        vercel_hosts = []
-        for o in allow_origins:
-            u = urlparse(o)
-            host = (u.hostname or "").lower()
-            if host.endswith(".vercel.app"):
-                base = host[: -len(".vercel.app")]
-                if base:
-                    vercel_hosts.append(re.escape(base))
-        if vercel_hosts:
-            cors_preview_regex = rf"^https://(?:{'|'.join(vercel_hosts)})(?:-[a-z0-9-]+)*\.vercel\.app$"
+        cors_preview_regex = _compute_vercel_preview_regex(cors_env)
     except Exception:
         cors_preview_regex = None
 
@@ -262,7 +343,7 @@ def debug_env():
     }
 
 @router.get("/debug/db_ping")
-def debug_db_ping():
+async def debug_db_ping():
     """
     VÃ©rifie rÃ©ellement la connexion Postgres (SELECT 1).
     Ne renvoie jamais l'URL complÃ¨te ni de secrets.
@@ -279,10 +360,13 @@ def debug_db_ping():
         except Exception:
             host = None
 
-        with get_conn() as conn:
-            with conn.cursor() as cur:
-                cur.execute("select 1;")
-                _ = cur.fetchone()
+        def _ping() -> None:
+            with get_conn() as conn:
+                with conn.cursor() as cur:
+                    cur.execute("select 1;")
+                    _ = cur.fetchone()
+
+        await asyncio.to_thread(_ping)
         return {"ok": True, "host": host}
     except Exception as e:
         return {"ok": False, "host": host, "error": str(e)}
@@ -307,23 +391,32 @@ def cloud_audio_catalog():
 
 
 @router.get("/playlists")
-def playlists(request: Request):
+async def playlists(request: Request):
     """
     Playlists (auth).
     """
-    _ = get_current_user(request)
+    _ = await asyncio.to_thread(get_current_user, request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
 
+    # One GROUP BY query per distinct kind (all themes share "ambience" today).
+    tags_by_kind: dict[str | None, list[str]] = {}
+    for p in PLAYLIST_THEMES:
+        kind = str(p.get("kind") or "").strip() or None
+        tags_by_kind.setdefault(kind, []).append(str(p.get("tag") or "").strip())
+    results = await asyncio.gather(
+        *(asyncio.to_thread(count_audio_assets_by_tags, tags, kind=kind) for kind, tags in tags_by_kind.items()),
+        return_exceptions=True,
+    )
+    counts: dict[str | None, dict[str, int]] = {
+        kind: (res if isinstance(res, dict) else {}) for kind, res in zip(tags_by_kind, results)
+    }
+
     out = []
     for p in PLAYLIST_THEMES:
         tag = str(p.get("tag") or "").strip()
         kind = str(p.get("kind") or "").strip() or None
-        try:
-            items_full = list_audio_assets(kind=kind, tag=tag, limit=1000, offset=0)
-            count = len(items_full)
-        except Exception:
-            count = 0
+        count = counts.get(kind, {}).get(tag.lower(), 0)
         out.append(
             {
                 "tag": tag,
@@ -336,31 +429,82 @@ def playlists(request: Request):
     return {"playlists": out}
 
 
+async def _with_signed_urls(items: list[dict], expires: int) -> list[dict]:
+    """
+    Attache `signed_url` à chaque item; les signatures (1 HTTPS chacune) partent en parallèle.
+    """
+    keys = [str((it or {}).get("storage_key") or "").lstrip("/") for it in items or []]
+    signed: list = [None] * len(keys)
+    if storage_enabled():
+        todo = [i for i, k in enumerate(keys) if k]
+        results = await asyncio.gather(
+            *(asyncio.to_thread(sign_url, keys[i], expires_in=expires) for i in todo),
+            return_exceptions=True,
+        )
+        for i, res in zip(todo, results):
+            signed[i] = res if isinstance(res, str) else None
+    return [{**it, "signed_url": s} for it, s in zip(items or [], signed)]
+
+
+# Déclaré avant /playlists/{tag} (sinon "batch" serait pris pour un tag).
+@router.get("/playlists/batch")
+async def playlists_batch(request: Request, limit: int = 6):
+    """
+    Playlists + first N items of each (auth): one round-trip for the playlists page.
+    """
+    _ = await asyncio.to_thread(get_current_user, request)
+    if not db_enabled():
+        raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
+    limit = max(1, min(int(limit or 6), 50))
+
+    themes = [(str(p.get("tag") or "").strip().lower(), str(p.get("kind") or "").strip() or None) for p in PLAYLIST_THEMES]
+    results = await asyncio.gather(
+        *(asyncio.to_thread(list_audio_assets, kind=kind, tag=tag, limit=limit, offset=0) for tag, kind in themes),
+        return_exceptions=True,
+    )
+    per_theme = [(res if isinstance(res, list) else []) for res in results]
+
+    # Sign everything in one concurrent batch, then split back per playlist.
+    expires = int(os.environ.get("SUPABASE_SIGNED_URL_EXPIRES", "3600") or 3600)
+    flat = await _with_signed_urls([it for items in per_theme for it in items], expires)
+
+    out = []
+    pos = 0
+    for p, items in zip(PLAYLIST_THEMES, per_theme):
+        out.append(
+            {
+                "tag": p.get("tag"),
+                "title": p.get("title"),
+                "subtitle": p.get("subtitle"),
+                "kind": p.get("kind"),
+                "items": flat[pos : pos + len(items)],
+            }
+        )
+        pos += len(items)
+    return {"playlists": out, "signed_expires_in": expires}
+
+
 @router.get("/playlists/{tag}")
-def playlist_items(tag: str, request: Request, limit: int = 50):
+async def playlist_items(tag: str, request: Request, limit: int = 50):
     """
     Playlist items (auth).
     """
-    _ = get_current_user(request)
+    _ = await asyncio.to_thread(get_current_user, request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     limit = max(1, min(int(limit or 50), 200))
     tag = str(tag or "").strip().lower()
 
-    meta = next((p for p in PLAYLIST_THEMES if str(p.get("tag") or "").lower() == tag), None)
+    meta = PLAYLIST_THEMES_BY_TAG.get(tag)
     kind = (str(meta.get("kind")) if isinstance(meta, dict) else "") or None
 
     try:
-        items = list_audio_assets(kind=kind, tag=tag, limit=limit, offset=0)
+        items = await asyncio.to_thread(list_audio_assets, kind=kind, tag=tag, limit=limit, offset=0)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
     expires = int(os.environ.get("SUPABASE_SIGNED_URL_EXPIRES", "3600") or 3600)
-    out_items = []
-    for it in items:
-        k = str((it or {}).get("storage_key") or "").lstrip("/")
-        signed = sign_url(k, expires_in=expires) if (storage_enabled() and k) else None
-        out_items.append({**it, "signed_url": signed})
+    out_items = await _with_signed_urls(items, expires)
 
     return {
         "playlist": {
@@ -373,71 +517,75 @@ def playlist_items(tag: str, request: Request, limit: int = 50):
 
 
 @router.get("/audio/library")
-def audio_library(request: Request, limit: int = 200):
+async def audio_library(request: Request, limit: int = 200):
     """
     Audio library (auth).
     """
-    _ = get_current_user(request)
+    _ = await asyncio.to_thread(get_current_user, request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     limit = max(1, min(int(limit or 200), 1000))
 
     try:
-        music = list_audio_assets(kind="music", limit=limit, offset=0)
-        amb = list_audio_assets(kind="ambience", limit=limit, offset=0)
+        music = await asyncio.to_thread(list_audio_assets, kind="music", limit=limit, offset=0)
+        amb = await asyncio.to_thread(list_audio_assets, kind="ambience", limit=limit, offset=0)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
     expires = int(os.environ.get("SUPABASE_SIGNED_URL_EXPIRES", "3600") or 3600)
-
-    def attach(items: list[dict]) -> list[dict]:
-        out = []
-        for it in items or []:
-            k = str((it or {}).get("storage_key") or "").lstrip("/")
-            signed = sign_url(k, expires_in=expires) if (storage_enabled() and k) else None
-            out.append({**it, "signed_url": signed})
-        return out
+    se = storage_enabled()
+    signed = await _with_signed_urls((music or []) + (amb or []), expires)
 
     return {
-        "music": attach(music),
-        "ambiences": attach(amb),
+        "music": signed[: len(music or [])],
+        "ambiences": signed[len(music or []) :],
         "signed_expires_in": expires,
-        "storage_enabled": bool(storage_enabled()),
+        "storage_enabled": bool(se),
     }
 
 
 @router.get("/chat/history")
-def chat_history(request: Request, limit: int = 50):
+async def chat_history(request: Request, limit: int = 50):
     """
     Returns authenticated user's chat history (latest N, oldest->newest).
     """
-    u = get_current_user(request)
+    u = await asyncio.to_thread(get_current_user, request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        items = list_chat_messages(user_id=u.id, limit=limit)
+        items = await asyncio.to_thread(list_chat_messages, user_id=u.id, limit=limit)
         return {"messages": items}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
 
 @router.delete("/chat/history")
-def chat_clear_history(request: Request):
+async def chat_clear_history(request: Request):
     """
     Clears authenticated user's chat history.
     """
-    u = get_current_user(request)
+    u = await asyncio.to_thread(get_current_user, request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        deleted = clear_chat_messages(user_id=u.id)
+        deleted = await asyncio.to_thread(clear_chat_messages, user_id=u.id)
         return {"ok": True, "deleted": deleted}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
 
+def _persist_chat_turn(user_id: str, user_text: str, reply: str) -> None:
+    # Tâche de fond (après envoi de la réponse): on garde l'ordre user -> model.
+    try:
+        insert_chat_message(user_id=user_id, role="user", content=user_text)
+        insert_chat_message(user_id=user_id, role="model", content=reply)
+    except Exception:
+        # If DB write fails, the reply was already returned
+        pass
+
+
 @router.post("/chat")
-async def chat(payload: ChatRequest, request: Request):
+async def chat(payload: ChatRequest, request: Request, background_tasks: BackgroundTasks):
     """
     Chat endpoint backed by Gemini (server-side API key).
     Requires Supabase auth (Authorization bearer token).
@@ -466,39 +614,32 @@ async def chat(payload: ChatRequest, request: Request):
         raise HTTPException(status_code=400, detail="Empty message")
     msgs.append({"role": "user", "content": user_text})
 
-    # Optional admin steering (reuse forced_generation_text as "system" prefix)
+    # Admin config (stat-cached): loaded once for both the steering prefix and the default model.
     try:
         cfg = load_admin_app_config()
-        forced = (cfg.forced_generation_text or "").strip()
-        if forced:
-            msgs = [{"role": "user", "content": f"INSTRUCTION ADMIN (prioritaire):\n{forced}"}] + msgs
     except Exception:
-        pass
+        cfg = None
+
+    # Optional admin steering (reuse forced_generation_text as "system" prefix)
+    forced = (getattr(cfg, "forced_generation_text", "") or "").strip()
+    if forced:
+        msgs = [{"role": "user", "content": f"INSTRUCTION ADMIN (prioritaire):\n{forced}"}] + msgs
 
     try:
-        try:
-            cfg = load_admin_app_config()
-            default_model = (cfg.chat_model_default or "").strip()
-        except Exception:
-            default_model = ""
+        default_model = (getattr(cfg, "chat_model_default", "") or "").strip()
         model = str(payload.model or "").strip() or default_model or "gemini-pro-latest"
         reply = await chat_gemini(msgs, model=model)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"Chat error: {_redact_secrets(str(e))}")
 
-    # Persist both user and model messages
-    try:
-        insert_chat_message(user_id=u.id, role="user", content=user_text)
-        insert_chat_message(user_id=u.id, role="model", content=reply)
-    except Exception:
-        # If DB write fails, still return reply
-        pass
+    # Persist both user and model messages once the response is sent
+    background_tasks.add_task(_persist_chat_turn, u.id, user_text, reply)
 
     return ChatResponse(reply=reply, stored=True)
 
 
 @router.get("/admin/wellbeing_events")
-def admin_wellbeing_events(
+async def admin_wellbeing_events(
     request: Request,
     limit: int = 200,
     device_id: str | None = None,
@@ -509,19 +650,19 @@ def admin_wellbeing_events(
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        events = list_wellbeing_events(limit=limit, device_id=device_id, tag=tag, days=days)
+        events = await asyncio.to_thread(list_wellbeing_events, limit=limit, device_id=device_id, tag=tag, days=days)
         return {"events": events}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
 
 @router.get("/admin/wellbeing_stats")
-def admin_wellbeing_stats(request: Request, days: int = 30):
+async def admin_wellbeing_stats(request: Request, days: int = 30):
     _require_admin(request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        return wellbeing_stats(days=days)
+        return await asyncio.to_thread(wellbeing_stats, days=days)
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
@@ -547,7 +688,7 @@ async def admin_save_app_config(request: Request):
     """
     _require_admin(request)
     try:
-        payload = await request.json()
+        payload = await _read_json(request)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
 
@@ -571,11 +712,12 @@ def admin_storage_expected(request: Request):
     Helper endpoint for admin UI: returns expected audio keys + current catalog presence.
     """
     _require_admin(request)
+    se = storage_enabled()
     return {
-        "enabled": storage_enabled(),
+        "enabled": se,
         "bucket": os.environ.get("SUPABASE_STORAGE_BUCKET"),
         "expected": expected_audio_paths(),
-        "catalog": build_default_catalog() if storage_enabled() else {"enabled": False, "music": {}, "ambiences": {}},
+        "catalog": build_default_catalog() if se else {"enabled": False, "music": {}, "ambiences": {}},
     }
 
 
@@ -592,25 +734,49 @@ def admin_storage_list(request: Request, prefix: str = "", limit: int = 200, off
 
 
 @router.get("/admin/audio_assets")
-def admin_list_audio_assets(
+async def admin_list_audio_assets(
     request: Request,
     kind: str | None = None,
     q: str | None = None,
     tag: str | None = None,
     limit: int = 200,
     offset: int = 0,
+    cursor: str | None = None,
 ):
     """
     List audio asset metadata stored in DB (admin only).
+    Pagination: pass back `next_cursor` as `cursor` (keyset, preferred over offset).
     """
     _require_admin(request)
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
+    cur = _decode_cursor(cursor) if cursor else None
     try:
-        items = list_audio_assets(kind=kind, q=q, tag=tag, limit=limit, offset=offset)
-        return {"items": items}
+        items = await asyncio.to_thread(
+            list_audio_assets, kind=kind, q=q, tag=tag, limit=limit, offset=offset, cursor=cur
+        )
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
+    next_cursor = None
+    if items and len(items) >= max(1, min(int(limit or 200), 1000)):
+        last = items[-1]
+        next_cursor = _encode_cursor(last.get("updated_at") or "", last.get("id") or 0)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def _encode_cursor(updated_at: str, aid: Any) -> str:
+    raw = f"{updated_at}|{aid}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        s = str(cursor).strip()
+        raw = base64.urlsafe_b64decode(s + "=" * (-len(s) % 4)).decode("utf-8")
+        updated_at, aid = raw.rsplit("|", 1)
+        return (updated_at, int(aid))
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.post("/admin/audio_assets")
@@ -635,7 +801,7 @@ async def admin_upsert_audio_assets(request: Request):
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        payload = await request.json()
+        payload = await _read_json(request)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
     try:
@@ -668,7 +834,7 @@ async def admin_delete_audio_assets(request: Request):
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
     try:
-        payload = await request.json()
+        payload = await _read_json(request)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
     storage_key = str((payload or {}).get("storage_key") or "")
@@ -681,6 +847,28 @@ async def admin_delete_audio_assets(request: Request):
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
 
 
+# Magic bytes -> content-type (prevents HTML/text upload by mistake). Checked once, in order.
+_AUDIO_MAGIC = (
+    (b"ID3", "audio/mpeg"),
+    (b"RIFF", "audio/wav"),
+    (b"OggS", "audio/ogg"),
+    (b"\x1a\x45\xdf\xa3", "audio/webm"),  # EBML
+)
+_ALLOWED_EXT = (".mp3", ".wav", ".ogg", ".webm")
+
+
+def _sniff_audio_mime(head: bytes) -> Optional[str]:
+    for sig, mime in _AUDIO_MAGIC:
+        if head.startswith(sig):
+            if mime == "audio/wav" and head[8:12] != b"WAVE":
+                return None
+            return mime
+    # MP3 sans tag ID3: frame sync (11 bits à 1)
+    if len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0:
+        return "audio/mpeg"
+    return None
+
+
 @router.post("/admin/storage/upload")
 async def admin_storage_upload(
     request: Request,
@@ -701,34 +889,32 @@ async def admin_storage_upload(
     if not key_str:
         raise HTTPException(status_code=400, detail="Missing key")
     key_lower = key_str.lower()
-    if not (
-        key_lower.endswith(".mp3")
-        or key_lower.endswith(".wav")
-        or key_lower.endswith(".ogg")
-        or key_lower.endswith(".webm")
-    ):
+    if not key_lower.endswith(_ALLOWED_EXT):
         raise HTTPException(status_code=400, detail="Invalid extension (allowed: .mp3, .wav, .ogg, .webm)")
 
-    data = await file.read()
-    if not data:
+    # Stream: the multipart parser already spooled the body to a temp file; only sniff the head
+    # here and hand the file object to the uploader (no full 50MB copy in RAM).
+    head = bytes(await file.read(16) or b"")
+    if not head:
         raise HTTPException(status_code=400, detail="Empty upload")
-    if len(data) > 50 * 1024 * 1024:
+    size = file.size
+    if size is None:
+        file.file.seek(0, os.SEEK_END)
+        size = file.file.tell()
+    if size > 50 * 1024 * 1024:
         raise HTTPException(status_code=413, detail="File too large (max 50MB)")
 
     # Content-type best effort + magic bytes sniffing (prevents HTML/text upload by mistake)
     ct = (file.content_type or "").strip().lower()
-    head = bytes(data[:16] or b"")
-    is_mp3 = head.startswith(b"ID3") or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0)
-    is_wav = head.startswith(b"RIFF") and (b"WAVE" in head)
-    is_ogg = head.startswith(b"OggS")
-    is_webm = head.startswith(b"\x1a\x45\xdf\xa3")  # EBML
-    if not any([is_mp3, is_wav, is_ogg, is_webm]):
+    detected = _sniff_audio_mime(head)
+    if detected is None:
         raise HTTPException(status_code=400, detail="File does not look like a supported audio format")
     if not ct:
-        ct = "audio/mpeg" if is_mp3 else ("audio/wav" if is_wav else ("audio/ogg" if is_ogg else "audio/webm"))
+        ct = detected
 
     upsert_flag = str(upsert or "true").strip().lower() in ("1", "true", "yes", "y", "on")
-    res = upload_object(key_str, data, content_type=ct, upsert=upsert_flag)
+    await file.seek(0)
+    res = await asyncio.to_thread(upload_object, key_str, file.file, content_type=ct, upsert=upsert_flag)
     if not res.get("ok"):
         raise HTTPException(status_code=400, detail=res.get("error") or "Upload failed")
     # Best-effort: auto-create metadata row for easier catalog curation (if DB enabled).
@@ -754,7 +940,7 @@ async def admin_storage_move(request: Request):
     if not storage_enabled():
         raise HTTPException(status_code=503, detail="Storage disabled (SUPABASE_* missing)")
     try:
-        payload = await request.json()
+        payload = await _read_json(request)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
     src = str((payload or {}).get("source") or "")
@@ -775,7 +961,7 @@ async def admin_storage_delete(request: Request):
     if not storage_enabled():
         raise HTTPException(status_code=503, detail="Storage disabled (SUPABASE_* missing)")
     try:
-        payload = await request.json()
+        payload = await _read_json(request)
     except Exception:
         raise HTTPException(status_code=400, detail="Invalid JSON")
     key = str((payload or {}).get("key") or "")
@@ -783,6 +969,8 @@ async def admin_storage_delete(request: Request):
     if not res.get("ok"):
         raise HTTPException(status_code=400, detail=res.get("error") or "Delete failed")
     return {"ok": True, "key": res.get("key")}
+
+
 @router.post("/feedback/wellbeing")
 async def feedback_wellbeing(payload: WellBeingFeedback, request: Request):
     """
@@ -791,16 +979,8 @@ async def feedback_wellbeing(payload: WellBeingFeedback, request: Request):
     - si DATABASE_URL est dÃ©fini => Postgres (Supabase) table wellbeing_events
     - sinon => fichier local assets/feedback/wellbeing.jsonl
     """
-    import json
-    from pathlib import Path
-
-    base_dir = Path(__file__).resolve().parent.parent
-    fb_dir = base_dir / "assets" / "feedback"
-    fb_dir.mkdir(parents=True, exist_ok=True)
-    path = fb_dir / "wellbeing.jsonl"
-
     # Always bind event to authenticated Supabase user (prevents mixing users)
-    u = get_current_user(request)
+    u = await asyncio.to_thread(get_current_user, request)
     event = payload.model_dump()
     event["user_id"] = u.id
     event["user_email"] = u.email
@@ -815,7 +995,8 @@ async def feedback_wellbeing(payload: WellBeingFeedback, request: Request):
     # Prefer DB if enabled
     if db_enabled():
         try:
-            insert_wellbeing_event(
+            await asyncio.to_thread(
+                insert_wellbeing_event,
                 event_id=str(event.get("id") or ""),
                 device_id=str(event.get("device_id") or ""),
                 user_id=str(event.get("user_id") or "") or None,
@@ -836,9 +1017,17 @@ async def feedback_wellbeing(payload: WellBeingFeedback, request: Request):
             except Exception:
                 pass
 
-    line = json.dumps(event, ensure_ascii=False) + "\n"
-    with path.open("a", encoding="utf-8") as f:
-        f.write(line)
+    line = _dumps_line(event)
+
+    def _append() -> None:
+        # O_APPEND + un seul write: ligne entière, sans entrelacement entre workers.
+        fd = os.open(_FB_PATH, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    await asyncio.to_thread(_append)
     return {"ok": True, "stored": "file"}
 
 
@@ -850,9 +1039,6 @@ def get_state(device_id: str):
     - si DATABASE_URL => table client_state
     - sinon => fichier assets/state/<device_id>.json
     """
-    import json
-    from pathlib import Path
-
     if db_enabled():
         try:
             state = get_client_state(device_id=device_id) or {}
@@ -862,16 +1048,23 @@ def get_state(device_id: str):
             # Ne renvoie pas DATABASE_URL; seulement l'erreur brute.
             return {"device_id": device_id, "state": {}, "stored": "file", "db_error": str(e)}
 
-    base_dir = Path(__file__).resolve().parent.parent
-    st_dir = base_dir / "assets" / "state"
-    st_dir.mkdir(parents=True, exist_ok=True)
-    fp = st_dir / f"{device_id}.json"
-    if fp.exists():
-        try:
-            return {"device_id": device_id, "state": json.loads(fp.read_text(encoding="utf-8")), "stored": "file"}
-        except Exception:
-            return {"device_id": device_id, "state": {}, "stored": "file"}
-    return {"device_id": device_id, "state": {}, "stored": "file"}
+    fp = _STATE_DIR / f"{device_id}.json"
+    try:
+        raw = state_writer.pending(fp)
+        if raw is None:
+            raw = fp.read_bytes()
+    except Exception:
+        raw = b""
+    try:
+        _loads(raw)
+    except Exception:
+        raw = b""
+    if not raw.strip():
+        # Fichier absent, vide ou corrompu (ex: tronqué) => état vide, comme avant.
+        return {"device_id": device_id, "state": {}, "stored": "file"}
+    # JSON validé: on insère les octets tels quels, sans re-sérialisation.
+    body = b'{"device_id":' + _dumps_line(device_id).rstrip() + b',"state":' + raw + b',"stored":"file"}'
+    return Response(content=body, media_type="application/json")
 
 
 @router.get("/state/user")
@@ -900,14 +1093,14 @@ async def save_state_user(request: Request):
     """
     if not db_enabled():
         raise HTTPException(status_code=503, detail="DB disabled (DATABASE_URL/psycopg missing)")
-    u = get_current_user(request)
+    u = await asyncio.to_thread(get_current_user, request)
     try:
-        body = await request.json()
+        body = await _read_json(request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
     state = body.get("state", body)
     try:
-        upsert_user_state(user_id=u.id, state=state)
+        await asyncio.to_thread(upsert_user_state, user_id=u.id, state=state)
         return {"ok": True, "stored": "db"}
     except Exception as e:
         raise HTTPException(status_code=503, detail=f"DB error: {e}")
@@ -919,11 +1112,8 @@ async def save_state(device_id: str, request: Request):
     Sauve l'Ã©tat (progress/settings) d'un device.
     Le frontend envoie un JSON libre (on garde la structure cÃ´tÃ© UI).
     """
-    import json
-    from pathlib import Path
-
     try:
-        body = await request.json()
+        body = await _read_json(request)
     except Exception as e:
         # Mauvais JSON (souvent un problÃ¨me d'Ã©chappement dans PowerShell/curl)
         raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
@@ -931,16 +1121,13 @@ async def save_state(device_id: str, request: Request):
 
     if db_enabled():
         try:
-            upsert_client_state(device_id=device_id, state=state)
+            await asyncio.to_thread(upsert_client_state, device_id=device_id, state=state)
             return {"ok": True, "stored": "db"}
         except Exception as e:
             return {"ok": True, "stored": "file", "db_error": str(e)}
 
-    base_dir = Path(__file__).resolve().parent.parent
-    st_dir = base_dir / "assets" / "state"
-    st_dir.mkdir(parents=True, exist_ok=True)
-    fp = st_dir / f"{device_id}.json"
-    fp.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
+    # Écriture différée (fusionne les POST rapprochés, tmp + os.replace), hors de la boucle d'événements
+    state_writer.enqueue(_STATE_DIR / f"{device_id}.json", _dumps_indent(state))
     return {"ok": True, "stored": "file"}
 
 @router.get("/runs")
@@ -948,45 +1135,49 @@ def list_runs(request: Request, limit: int = 50):
     """
     Liste les derniers runs (mÃ©tadonnÃ©es lÃ©gÃ¨res).
     """
-    import json
-    from pathlib import Path
-
     u = get_current_user(request)
-    base_dir = Path(__file__).resolve().parent.parent
-    runs_dir = base_dir / "assets" / "runs"
+    runs_dir = _RUNS_DIR
     if not runs_dir.exists():
         return {"runs": []}
 
-    runs = []
-    for d in runs_dir.iterdir():
-        if not d.is_dir():
-            continue
-        rid = d.name
-        req_path = d / "request.json"
-        meta = {}
-        if req_path.exists():
-            try:
-                meta = json.loads(req_path.read_text(encoding="utf-8"))
-            except Exception:
-                meta = {}
-        # Per-user isolation: only list runs that belong to current user
-        owner = str(meta.get("_user_id") or meta.get("user_id") or "").strip()
-        if owner != u.id:
-            continue
+    def scan() -> list[dict]:
+        # Scan complet: seulement pour construire l'index de l'utilisateur la première fois.
+        runs = []
+        with os.scandir(runs_dir) as it:
+            for d in it:
+                if not d.is_dir():
+                    continue
+                meta = _read_json_file(os.path.join(d.path, "request.json"), {})
+                if not isinstance(meta, dict):
+                    meta = {}
+                # Per-user isolation: only list runs that belong to current user
+                owner = str(meta.get("_user_id") or meta.get("user_id") or "").strip()
+                if owner != u.id:
+                    continue
 
-        runs.append(
-            {
-                "run_id": rid,
-                "created_at": int(d.stat().st_mtime),
-                "objectif": meta.get("objectif"),
-                "duree_minutes": meta.get("duree_minutes"),
-                "style": meta.get("style"),
-                "has_mix": (d / "mix.wav").exists(),
-            }
-        )
+                runs.append(
+                    {
+                        "run_id": d.name,
+                        "created_at": int(d.stat().st_mtime),
+                        "objectif": meta.get("objectif"),
+                        "duree_minutes": meta.get("duree_minutes"),
+                        "style": meta.get("style"),
+                        "has_mix": os.path.exists(os.path.join(d.path, "mix.wav")),
+                    }
+                )
+        return runs
 
-    runs.sort(key=lambda x: x["created_at"], reverse=True)
-    return {"runs": runs[: max(1, min(limit, 500))]}
+    runs = run_index.list_runs(_BASE_DIR, u.id, rebuild=scan)
+    runs.sort(key=lambda x: x.get("created_at") or 0, reverse=True)
+    limit = max(1, min(limit, 500))
+    out = []
+    for r in runs:
+        # Un dossier supprimé hors API reste dans l'index: on ne vérifie que ce qu'on renvoie.
+        if os.path.isdir(os.path.join(runs_dir, str(r.get("run_id") or ""))):
+            out.append(r)
+            if len(out) >= limit:
+                break
+    return {"runs": out}
 
 
 @router.get("/runs/{run_id}")
@@ -994,38 +1185,23 @@ def get_run(run_id: str, request: Request):
     """
     Retourne les dÃ©tails d'un run (texte + paths).
     """
-    import json
-    from pathlib import Path
-
-    base_dir = Path(__file__).resolve().parent.parent
-    run_dir = base_dir / "assets" / "runs" / run_id
+    run_dir = _RUNS_DIR / run_id
     if not run_dir.exists():
         raise HTTPException(status_code=404, detail="Run introuvable")
 
     u = get_current_user(request)
-    req = {}
-    if (run_dir / "request.json").exists():
-        try:
-            req = json.loads((run_dir / "request.json").read_text(encoding="utf-8"))
-        except Exception:
-            req = {}
+    req = _read_json_file(str(run_dir / "request.json"), {})
+    if not isinstance(req, dict):
+        req = {}
     owner = str(req.get("_user_id") or req.get("user_id") or "").strip()
     if owner != u.id:
         raise HTTPException(status_code=404, detail="Run introuvable")
 
-    texte = None
-    if (run_dir / "script.json").exists():
-        try:
-            texte = json.loads((run_dir / "script.json").read_text(encoding="utf-8"))
-        except Exception:
-            texte = None
+    texte = _read_json_file(str(run_dir / "script.json"))
 
-    binaural_meta = {}
-    if (run_dir / "binaural.json").exists():
-        try:
-            binaural_meta = json.loads((run_dir / "binaural.json").read_text(encoding="utf-8"))
-        except Exception:
-            binaural_meta = {}
+    binaural_meta = _read_json_file(str(run_dir / "binaural.json"), {})
+    if not isinstance(binaural_meta, dict):
+        binaural_meta = {}
 
     resp = {
         "run_id": run_id,
@@ -1042,9 +1218,9 @@ def get_run(run_id: str, request: Request):
         "tts_cache_hit": None,
         "tts_error": None,
     }
-    if (run_dir / "tts_meta.json").exists():
+    tts_meta = _read_json_file(str(run_dir / "tts_meta.json"))
+    if tts_meta is not None:
         try:
-            tts_meta = json.loads((run_dir / "tts_meta.json").read_text(encoding="utf-8"))
             resp["tts_provider_used"] = tts_meta.get("tts_provider_used")
             resp["tts_cache_hit"] = tts_meta.get("tts_cache_hit")
             resp["tts_error"] = tts_meta.get("tts_error")
@@ -1063,62 +1239,142 @@ def export_tts_dataset():
     - request.json
     - binaural.json (si prÃ©sent)
     - tts_meta.json (si prÃ©sent)
+    Le ZIP est streamé (aucune copie sur disque).
     """
-    import zipfile
-    from pathlib import Path
+    runs_dir = _RUNS_DIR
 
-    base_dir = Path(__file__).resolve().parent.parent
-    runs_dir = base_dir / "assets" / "runs"
-    exports_dir = base_dir / "assets" / "exports"
-    exports_dir.mkdir(parents=True, exist_ok=True)
+    def files():
+        if not runs_dir.exists():
+            return
+        with os.scandir(runs_dir) as it:
+            for d in it:
+                if not d.is_dir():
+                    continue
+                for fname in ("voice.wav", "script.json", "request.json", "binaural.json", "tts_meta.json"):
+                    fp = os.path.join(d.path, fname)
+                    if os.path.isfile(fp):
+                        yield fp, f"{d.name}/{fname}"
 
     ts = time.strftime("%Y%m%d-%H%M%S")
-    zip_path = exports_dir / f"tts_dataset_{ts}.zip"
+    return StreamingResponse(
+        _iter_zip(files()),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="tts_dataset_{ts}.zip"'},
+    )
 
-    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-        if runs_dir.exists():
-            for run_dir in runs_dir.iterdir():
-                if not run_dir.is_dir():
-                    continue
-                run_id = run_dir.name
-                for fname in ("voice.wav", "script.json", "request.json", "binaural.json", "tts_meta.json"):
-                    fp = run_dir / fname
-                    if fp.exists():
-                        zf.write(fp, arcname=f"{run_id}/{fname}")
 
-    return FileResponse(path=str(zip_path), filename=zip_path.name, media_type="application/zip")
+def _iter_zip(files):
+    """
+    Écrit un ZIP dans un flux non-seekable (data descriptors) et rend les octets au fil de l'eau.
+    Les .wav (PCM) sont stockés sans compression (ZIP_STORED): gain nul, CPU inutile.
+    """
+    buf = bytearray()
+
+    class _Sink:
+        def write(self, b) -> int:
+            buf.extend(b)
+            return len(b)
+
+        def flush(self) -> None:
+            pass
+
+    with zipfile.ZipFile(_Sink(), "w") as zf:
+        for fp, arcname in files:
+            try:
+                zi = zipfile.ZipInfo.from_file(fp, arcname)
+                zi.compress_type = zipfile.ZIP_STORED if arcname.endswith(".wav") else zipfile.ZIP_DEFLATED
+                with open(fp, "rb") as src, zf.open(zi, "w", force_zip64=True) as dst:
+                    while True:
+                        chunk = src.read(1 << 20)
+                        if not chunk:
+                            break
+                        dst.write(chunk)
+                        if buf:
+                            yield bytes(buf)
+                            buf.clear()
+            except OSError:
+                # Fichier supprimé pendant l'export: on passe au suivant
+                continue
+            if buf:
+                yield bytes(buf)
+                buf.clear()
+    if buf:
+        yield bytes(buf)
 
 
 @router.delete("/runs/{run_id}")
-def delete_run(run_id: str, request: Request):
+async def delete_run(run_id: str, request: Request, background_tasks: BackgroundTasks):
     """
     Supprime un run (dossier assets/runs/<run_id>).
+    Le dossier est d'abord renommé (instantané), le rmtree se fait après la réponse.
     """
-    import shutil
-    from pathlib import Path
-
-    base_dir = Path(__file__).resolve().parent.parent
-    run_dir = base_dir / "assets" / "runs" / run_id
-    if not run_dir.exists():
+    run_dir = _RUNS_DIR / run_id
+    # Tout l'accès disque (stat/lecture, puis renommage + index) passe par des threads: rien sur la boucle.
+    owner = await asyncio.to_thread(_run_owner, run_dir)
+    if owner is None:
         raise HTTPException(status_code=404, detail="Run introuvable")
     # ownership check
-    import json
-    req = {}
-    if (run_dir / "request.json").exists():
-        try:
-            req = json.loads((run_dir / "request.json").read_text(encoding="utf-8"))
-        except Exception:
-            req = {}
-    u = get_current_user(request)
-    owner = str(req.get("_user_id") or req.get("user_id") or "").strip()
+    u = await asyncio.to_thread(get_current_user, request)
     if owner != u.id:
         raise HTTPException(status_code=404, detail="Run introuvable")
-    shutil.rmtree(run_dir, ignore_errors=True)
+
+    doomed = await asyncio.to_thread(_trash_run, run_dir, run_id, u.id)
+    background_tasks.add_task(shutil.rmtree, doomed, ignore_errors=True)
     return {"deleted": run_id}
 
 
+def _run_owner(run_dir: Path) -> Optional[str]:
+    """Propriétaire du run (request.json), None si le dossier n'existe pas."""
+    if not run_dir.exists():
+        return None
+    req = _read_json_file(str(run_dir / "request.json"), {})
+    if not isinstance(req, dict):
+        req = {}
+    return str(req.get("_user_id") or req.get("user_id") or "").strip()
+
+
+def _trash_run(run_dir: Path, run_id: str, user_id: str) -> Path:
+    """Renomme le run dans assets/.trash (instantané) et le retire de l'index; retourne le dossier à supprimer."""
+    trash_dir = _BASE_DIR / "assets" / ".trash"
+    doomed = run_dir
+    try:
+        trash_dir.mkdir(parents=True, exist_ok=True)
+        doomed = trash_dir / f"{run_id}-{secrets.token_hex(3)}"
+        os.replace(run_dir, doomed)
+    except OSError:
+        doomed = run_dir
+    try:
+        run_index.remove_run(_BASE_DIR, user_id, run_id)
+    except Exception:
+        pass
+    return doomed
+
+
+def _cached_bed(cache_path: Path, out_path: Path, synth) -> None:
+    """
+    Piste déterministe (musique/binaural): synthétisée une fois par jeu de paramètres,
+    puis liée (hardlink, sinon copie) dans le dossier du run.
+    """
+    if not cache_path.exists():
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_name(f"{cache_path.stem}.{secrets.token_hex(4)}.tmp.wav")
+        try:
+            synth(str(tmp))
+            os.replace(tmp, cache_path)
+        finally:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+    copy_file_fast(cache_path, out_path)
+
+
+# /generate en cours, par clé de payload (single-flight).
+_INFLIGHT: dict[str, asyncio.Future] = {}
+
+
 @router.post("/generate", response_model=GenerationResponse)
-async def generate(request: GenerationRequest, http_request: Request):
+async def generate(request: GenerationRequest, http_request: Request, background_tasks: BackgroundTasks):
     """
     Pipeline principal :
     1. GÃ©nÃ©rer le texte structurÃ© via Ollama.
@@ -1126,8 +1382,6 @@ async def generate(request: GenerationRequest, http_request: Request):
     3. GÃ©nÃ©rer/simuler la musique d'ambiance.
     4. GÃ©nÃ©rer/simuler un lit binaural (mixable).
     """
-    from pathlib import Path
-    base_dir = Path(__file__).resolve().parent.parent
     u = get_current_user(http_request)
 
     # Cache/fallback: si une gÃ©nÃ©ration Ã©choue, on pourra renvoyer le dernier run OK pour ces paramÃ¨tres.
@@ -1135,14 +1389,49 @@ async def generate(request: GenerationRequest, http_request: Request):
     # Attach owner (used for /runs filtering); never trust client-supplied user identity
     payload["_user_id"] = u.id
     payload["_user_email"] = u.email
-    key = stable_cache_key(payload)
-    cached = try_load_cached(base_dir=base_dir, key=key)
+    # Une seule sérialisation du payload: clé de cache + request.json
+    canon = canonical_json(payload)
+    key = hash_key(canon)
+
+    # Requêtes identiques simultanées (double clic, retry client): un seul pipeline, même réponse.
+    inflight = _INFLIGHT.get(key)
+    if inflight is not None:
+        return await asyncio.shield(inflight)
+    fut = asyncio.get_running_loop().create_future()
+    _INFLIGHT[key] = fut
+    try:
+        resp = await _run_generation(request, u, payload, canon, key, background_tasks)
+    except asyncio.CancelledError:
+        # Leader annulé (client parti): les requêtes en attente reçoivent une 503, pas une annulation.
+        fut.set_exception(HTTPException(status_code=503, detail="Génération interrompue, réessayez"))
+        fut.exception()
+        raise
+    except BaseException as exc:
+        fut.set_exception(exc)
+        fut.exception()  # marquée "récupérée" même sans autre appelant en attente
+        raise
+    else:
+        fut.set_result(resp)
+        return resp
+    finally:
+        _INFLIGHT.pop(key, None)
+
+
+async def _run_generation(
+    request: GenerationRequest,
+    u: SupabaseUser,
+    payload: dict,
+    canon: bytes,
+    key: str,
+    background_tasks: BackgroundTasks,
+) -> GenerationResponse:
+    """Pipeline /generate pour un payload déjà canonisé (clé de cache `key`)."""
+    cached = try_load_cached(base_dir=_BASE_DIR, key=key)
     # Si l'ancien cache venait d'un fallback LLM, on prÃ©fÃ¨re regÃ©nÃ©rer (Ã©vite de "rester bloquÃ©" sur le script par dÃ©faut)
     if cached and cached.get("llm_fallback"):
         cached = None
     # Dossier "runs" : un nouveau run par gÃ©nÃ©ration (historique complet)
-    runs_dir = base_dir / "assets" / "runs"
-    runs_dir.mkdir(parents=True, exist_ok=True)
+    runs_dir = _RUNS_DIR
     run_id = time.strftime("%Y%m%d-%H%M%S") + "-" + key[:6] + "-" + secrets.token_hex(3)
     run_dir = runs_dir / run_id
     run_dir.mkdir(parents=True, exist_ok=True)
@@ -1153,41 +1442,74 @@ async def generate(request: GenerationRequest, http_request: Request):
     binaural_rel = f"assets/runs/{run_id}/binaural.wav"
     mix_rel = f"assets/runs/{run_id}/mix.wav"
 
-    tts_abs = base_dir / tts_rel
-    music_abs = base_dir / music_rel
-    binaural_abs = base_dir / binaural_rel
-    mix_abs = base_dir / mix_rel
+    tts_abs = _BASE_DIR / tts_rel
+    music_abs = _BASE_DIR / music_rel
+    binaural_abs = _BASE_DIR / binaural_rel
+    mix_abs = _BASE_DIR / mix_rel
 
     # Chemins legacy "latest" (compat / debugging)
-    legacy_tts_abs = base_dir / "assets/audio/session.wav"
-    legacy_music_abs = base_dir / "assets/music/ambient.wav"
-    legacy_binaural_abs = base_dir / "assets/audio/binaural.wav"
-    legacy_mix_abs = base_dir / "assets/audio/mix.wav"
+    legacy_tts_abs = _BASE_DIR / "assets/audio/session.wav"
+    legacy_music_abs = _BASE_DIR / "assets/music/ambient.wav"
+    legacy_binaural_abs = _BASE_DIR / "assets/audio/binaural.wav"
+    legacy_mix_abs = _BASE_DIR / "assets/audio/mix.wav"
 
+    beds_task = None
     try:
+        # 2) Music + 3) Binaural: ne dépendent pas du texte => lancés pendant LLM + TTS (réseau).
+        # Séquentiels entre eux dans un seul thread: pic RAM inchangé sur les petites instances.
+        binaural_band_used, binaural_beat_hz_used = _pick_binaural_band_and_beat(request)
+        # Résolution 0.01 Hz (clé du cache des pistes binaurales)
+        binaural_beat_hz_used = round(float(binaural_beat_hz_used), 2)
+
+        def _synth_beds() -> None:
+            # sr bas pour limiter RAM. Sorties déterministes => cache par paramètres + hardlink dans le run.
+            sr = 8000
+            dur = int(request.duree_minutes)
+            beat_centi = int(round(float(binaural_beat_hz_used) * 100))
+            _cached_bed(
+                _BASE_DIR / "assets" / "cache" / "beds" / f"music_{sr}_{dur}.wav",
+                music_abs,
+                lambda p: generate_music_bed(duration_minutes=dur, output_path=p, sample_rate=sr),
+            )
+            _cached_bed(
+                _BASE_DIR / "assets" / "cache" / "beds" / f"binaural_{sr}_{beat_centi}_{dur}.wav",
+                binaural_abs,
+                lambda p: generate_binaural_track(
+                    duration_minutes=dur,
+                    output_path=p,
+                    sample_rate=sr,
+                    beat_hz=beat_centi / 100.0,
+                ),
+            )
+
+        beds_task = asyncio.ensure_future(asyncio.to_thread(_synth_beds))
+        # Si on sort en erreur avant de l'attendre: pas de "Task exception was never retrieved".
+        beds_task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
         # Admin config: extra safety rules + optional template + defaults
         try:
             cfg = load_admin_app_config()
         except Exception:
             cfg = None
 
+        # GenerationRequest valide: champs toujours présents, providers typés Enum.
+        llm_provider = request.llm_provider.value
+        tts_provider = request.tts_provider.value
+
         try:
             # Default model overrides (only if client didn't explicitly set something custom)
-            prov = getattr(request, "llm_provider", "ollama")
-            llm_provider = getattr(prov, "value", str(prov))
             if llm_provider == "gemini":
                 default_model = (getattr(cfg, "gemini_model_default", "") or "").strip()
-                if default_model and (not str(getattr(request, "gemini_model", "") or "").strip() or str(getattr(request, "gemini_model", "")).strip() == "gemini-pro-latest"):
+                current_model = (request.gemini_model or "").strip()
+                if default_model and (not current_model or current_model == "gemini-pro-latest"):
                     request.gemini_model = default_model
         except Exception:
             pass
 
         try:
-            prov = getattr(request, "tts_provider", "local")
-            tts_provider = getattr(prov, "value", str(prov))
             if tts_provider == "elevenlabs":
                 default_voice_id = (getattr(cfg, "elevenlabs_voice_id_default", "") or "").strip()
-                if default_voice_id and not str(getattr(request, "elevenlabs_voice_id", "") or "").strip():
+                if default_voice_id and not (request.elevenlabs_voice_id or "").strip():
                     request.elevenlabs_voice_id = default_voice_id
         except Exception:
             pass
@@ -1207,55 +1529,32 @@ async def generate(request: GenerationRequest, http_request: Request):
         # Safe: si LLM lent/HS, on ne casse pas /generate (on garde un texte fallback),
         # mais on expose l'Ã©tat pour que le frontend puisse l'afficher.
         # llm_provider peut Ãªtre un Enum (LLMProvider.gemini) => on prend .value si dispo pour un affichage clair.
-        prov = getattr(request, "llm_provider", "ollama")
-        llm_provider_used = getattr(prov, "value", str(prov))
-        llm_fallback = False
-        llm_error = None
+        llm_provider_used = llm_provider
         try:
-            sections = await generate_sections(prompt, request)
+            sections, llm_fallback, llm_error = await generate_sections(prompt, request)
         except Exception as e:
             sections = DEFAULT_SECTIONS
             llm_fallback = True
             llm_error = _redact_secrets(str(e))
-        # MÃªme si l'appel n'a pas levÃ©, on peut tomber sur DEFAULT_SECTIONS si parsing a Ã©chouÃ© ailleurs.
-        if sections is DEFAULT_SECTIONS:
-            llm_fallback = True
-            llm_error = llm_error or "LLM output not parsable; using DEFAULT_SECTIONS"
 
         # 1) TTS (avec cache pour Ã©viter de reconsommer le crÃ©dit ElevenLabs)
-        full_text = " ".join(sections.values())
-        prov = getattr(request, "tts_provider", "local")
-        tts_provider = getattr(prov, "value", str(prov))
-        cache_hit, tts_provider_used, tts_err = synthesize_tts_cached(
-            full_text=full_text,
+        cache_hit, tts_provider_used, tts_err = await asyncio.to_thread(
+            synthesize_tts_cached,
+            full_text=list(sections.values()),
             output_path=str(tts_abs),
             provider=tts_provider,
-            elevenlabs_voice_id=getattr(request, "elevenlabs_voice_id", "") or "",
-            base_dir=base_dir,
-        )
-        (run_dir / "tts_meta.json").write_text(
-            __import__("json").dumps(
-                {
-                    "tts_provider_requested": tts_provider,
-                    "tts_provider_used": tts_provider_used,
-                    "tts_cache_hit": cache_hit,
-                    "tts_error": tts_err,
-                },
-                ensure_ascii=False,
-                indent=2,
-            ),
-            encoding="utf-8",
+            elevenlabs_voice_id=request.elevenlabs_voice_id or "",
+            base_dir=_BASE_DIR,
         )
+        tts_meta = {
+            "tts_provider_requested": tts_provider,
+            "tts_provider_used": tts_provider_used,
+            "tts_cache_hit": cache_hit,
+            "tts_error": tts_err,
+        }
 
-        # 2) Music + 3) Binaural (sr bas pour limiter RAM)
-        generate_music_bed(duration_minutes=request.duree_minutes, output_path=str(music_abs), sample_rate=8000)
-        binaural_band_used, binaural_beat_hz_used = _pick_binaural_band_and_beat(request)
-        generate_binaural_track(
-            duration_minutes=request.duree_minutes,
-            output_path=str(binaural_abs),
-            sample_rate=8000,
-            beat_hz=float(binaural_beat_hz_used),
-        )
+        # 2) Music + 3) Binaural (lancés plus haut)
+        await beds_task
 
         # 4) Mixdown (optionnel)
         mix_path = None
@@ -1269,7 +1568,8 @@ async def generate(request: GenerationRequest, http_request: Request):
                 binaural_offset_s=request.binaural_offset_s,
             )
             try:
-                mixdown_to_wav(
+                await asyncio.to_thread(
+                    mixdown_to_wav,
                     voice_wav=tts_abs,
                     music_wav=music_abs,
                     binaural_wav=binaural_abs,
@@ -1282,17 +1582,14 @@ async def generate(request: GenerationRequest, http_request: Request):
                 mix_path = None
 
         # Copie "latest" (ne conditionne pas la rÃ©ussite du run)
-        try:
-            legacy_tts_abs.parent.mkdir(parents=True, exist_ok=True)
-            legacy_music_abs.parent.mkdir(parents=True, exist_ok=True)
-            legacy_binaural_abs.parent.mkdir(parents=True, exist_ok=True)
-            shutil.copyfile(str(tts_abs), str(legacy_tts_abs))
-            shutil.copyfile(str(music_abs), str(legacy_music_abs))
-            shutil.copyfile(str(binaural_abs), str(legacy_binaural_abs))
+        if _WRITE_LEGACY_LATEST:
+            latest = [(tts_abs, legacy_tts_abs), (music_abs, legacy_music_abs), (binaural_abs, legacy_binaural_abs)]
             if mix_path:
-                shutil.copyfile(str(mix_abs), str(legacy_mix_abs))
-        except Exception:
-            pass
+                latest.append((mix_abs, legacy_mix_abs))
+            await asyncio.gather(
+                *(asyncio.to_thread(copy_file_fast, src, dst) for src, dst in latest),
+                return_exceptions=True,
+            )
 
         resp = GenerationResponse(
             texte=HypnosisText(**sections),
@@ -1310,27 +1607,53 @@ async def generate(request: GenerationRequest, http_request: Request):
             tts_cache_hit=cache_hit,
             tts_error=tts_err,
         )
-        save_cached(base_dir=base_dir, key=key, data=resp.model_dump())
-        # Stocke les paramÃ¨tres aussi (audit / reproductibilitÃ©)
-        import json
-        (run_dir / "request.json").write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
-        (run_dir / "script.json").write_text(json.dumps(sections, ensure_ascii=False, indent=2), encoding="utf-8")
-        (run_dir / "binaural.json").write_text(
-            json.dumps(
-                {"binaural_band_used": binaural_band_used, "binaural_beat_hz_used": binaural_beat_hz_used},
-                ensure_ascii=False,
-                indent=2,
+        # Sérialisation JSON native pydantic (Rust), sans dict intermédiaire.
+        # Cache de fallback écrit après l'envoi de la réponse (personne ne le lit avant).
+        background_tasks.add_task(save_cached, _BASE_DIR, key, resp.model_dump_json().encode("utf-8"))
+        # Stocke les paramÃ¨tres aussi (audit / reproductibilitÃ©): toutes les méta du run en un lot.
+        # Synchrone: /runs et /runs/{id} (contrôle du propriétaire via request.json) doivent voir le run dès la réponse.
+        meta_files = [
+            (run_dir / "tts_meta.json", _dumps_indent(tts_meta)),
+            (run_dir / "request.json", canon),
+            (run_dir / "script.json", _dumps_indent(sections)),
+            (
+                run_dir / "binaural.json",
+                _dumps_indent({"binaural_band_used": binaural_band_used, "binaural_beat_hz_used": binaural_beat_hz_used}),
             ),
-            encoding="utf-8",
-        )
+        ]
         if llm_error:
-            (run_dir / "llm_error.txt").write_text(_redact_secrets(llm_error), encoding="utf-8")
+            meta_files.append((run_dir / "llm_error.txt", _redact_secrets(llm_error).encode("utf-8")))
+        await asyncio.to_thread(_bulk_write, meta_files)
+        try:
+            # Hors boucle: append_run prend le verrou de l'index, tenu par rebuild() pendant tout un scan.
+            await asyncio.to_thread(
+                run_index.append_run,
+                _BASE_DIR,
+                u.id,
+                {
+                    "run_id": run_id,
+                    "created_at": int(time.time()),
+                    "objectif": payload.get("objectif"),
+                    "duree_minutes": payload.get("duree_minutes"),
+                    "style": payload.get("style"),
+                    "has_mix": bool(mix_path),
+                },
+            )
+        except Exception:
+            # Index incomplet sinon (le run n'apparaîtrait jamais dans /runs): on le jette, /runs rescanne.
+            logger.exception("run index append failed for run %s", run_id)
+            try:
+                await asyncio.to_thread(run_index.invalidate, _BASE_DIR, u.id)
+            except Exception:
+                logger.exception("run index invalidation failed for user %s", u.id)
         return resp
 
     except Exception as exc:
+        if beds_task is not None and not beds_task.done():
+            beds_task.cancel()
         # Fallback : si on a un cache OK pour ce payload, on le renvoie.
         if cached and all(k in cached for k in ["texte", "tts_audio_path", "music_path", "binaural_path"]):
-            return GenerationResponse(**cached)
+            return GenerationResponse.model_validate(cached)
         raise HTTPException(status_code=500, detail=f"Erreur gÃ©nÃ©ration: {exc}")
 
 
@@ -1350,12 +1673,7 @@ async def test_elevenlabs(
     Ne gÃ©nÃ¨re que la voix, pas de musique/binaural/mixdown.
     IsolÃ© du reste de l'app pour les tests.
     """
-    from pathlib import Path
-    import time
-    import secrets
-    
-    base_dir = Path(__file__).resolve().parent.parent
-    test_dir = base_dir / "assets" / "test_tts"
+    test_dir = _BASE_DIR / "assets" / "test_tts"
     test_dir.mkdir(parents=True, exist_ok=True)
     
     # GÃ©nÃ¨re un nom de fichier unique
@@ -1,32 +1,61 @@
 import wave
+from math import gcd
 from pathlib import Path
 from typing import Tuple
 
 import numpy as np
 
+try:
+    from scipy.signal import resample_poly  # type: ignore
+except Exception:  # pragma: no cover - scipy optionnel
+    resample_poly = None  # type: ignore
+
+try:
+    import soundfile as sf  # type: ignore
+except Exception:  # pragma: no cover - soundfile optionnel (libsndfile)
+    sf = None  # type: ignore
+
 
 def _decode_pcm(raw: bytes, sampwidth: int) -> np.ndarray:
+    # float32: moitié moins de bande passante que float64, précision largement suffisante pour le mix.
     if sampwidth == 1:
-        x = np.frombuffer(raw, dtype=np.uint8).astype(np.float64)
-        return (x - 128.0) / 128.0
+        x = np.frombuffer(raw, dtype=np.uint8).astype(np.float32)
+        x -= np.float32(128.0)
+        x *= np.float32(1.0 / 128.0)
+        return x
     if sampwidth == 2:
-        return np.frombuffer(raw, dtype=np.int16).astype(np.float64) / 32768.0
+        x = np.frombuffer(raw, dtype=np.int16).astype(np.float32)
+        x *= np.float32(1.0 / 32768.0)
+        return x
     if sampwidth == 3:
+        # Les 3 octets LE vont dans les octets hauts d'un int32 LE: valeur = sample << 8,
+        # signe étendu gratuitement (une seule copie, pas de np.where).
         b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3)
-        signed = (b[:, 0].astype(np.int32) | (b[:, 1].astype(np.int32) << 8) | (b[:, 2].astype(np.int32) << 16))
-        signed = np.where(signed & 0x800000, signed - 0x1000000, signed).astype(np.int32)
-        return signed.astype(np.float64) / 8388608.0
+        wide = np.zeros(b.shape[0], dtype="<i4")
+        wide.view(np.uint8).reshape(-1, 4)[:, 1:] = b
+        x = wide.astype(np.float32)
+        x *= np.float32(1.0 / 2147483648.0)
+        return x
     if sampwidth == 4:
-        return np.frombuffer(raw, dtype=np.int32).astype(np.float64) / 2147483648.0
+        x = np.frombuffer(raw, dtype=np.int32).astype(np.float32)
+        x *= np.float32(1.0 / 2147483648.0)
+        return x
     raise ValueError(f"Unsupported WAV sample width: {sampwidth}")
 
 
 def read_wave(path: Path) -> Tuple[int, np.ndarray]:
     """
-    Lit un WAV et renvoie (sample_rate, signal_float64[-1,1]).
+    Lit un WAV et renvoie (sample_rate, signal_float32[-1,1]).
     - mono: shape (n,)
     - stéréo+: shape (n, channels)
+    libsndfile décode directement en float32 si soundfile est installé, sinon module wave.
     """
+    if sf is not None:
+        try:
+            data, sr = sf.read(str(path), dtype="float32", always_2d=False)
+            return int(sr), np.clip(data, -1.0, 1.0, out=data)
+        except Exception:
+            pass  # format exotique / fichier en cours d'écriture: on retente via wave
     with wave.open(str(path), "rb") as wf:
         nch = wf.getnchannels()
         sampwidth = wf.getsampwidth()
@@ -37,38 +66,68 @@ def read_wave(path: Path) -> Tuple[int, np.ndarray]:
     x = _decode_pcm(raw, sampwidth)
     if nch > 1:
         x = x.reshape(-1, nch)
-    return sr, np.clip(x, -1.0, 1.0)
+    return sr, np.clip(x, -1.0, 1.0, out=x)
 
 
 def read_wave_mono(path: Path) -> Tuple[int, np.ndarray]:
     """
-    Lit un WAV et renvoie (sample_rate, signal_mono_float64[-1,1]).
+    Lit un WAV et renvoie (sample_rate, signal_mono_float32[-1,1]).
     - Si stéréo: downmix vers mono.
     - Si 8/16/24/32-bit PCM: convertit vers float.
     """
     sr, x = read_wave(path)
     if x.ndim == 2:
-        x = x.mean(axis=1)
+        # Un seul buffer mono, accumulé voie par voie (pas de temporaire de mean()).
+        nch = x.shape[1]
+        mono = x[:, 0].copy()
+        for c in range(1, nch):
+            mono += x[:, c]
+        if nch > 1:
+            mono *= np.float32(1.0 / nch)
+        return sr, mono
     return sr, x
 
 
+def _upsample_int(x: np.ndarray, up: int) -> np.ndarray:
+    """Interpolation linéaire x`up` sans linspace/interp: x[k] + (x[k+1]-x[k]) * j/up."""
+    d = np.empty_like(x)
+    np.subtract(x[1:], x[:-1], out=d[:-1])
+    d[-1] = 0.0
+    frac = (np.arange(up, dtype=np.float32) / np.float32(up)).reshape((1, up) + (1,) * (x.ndim - 1))
+    out = d[:, None] * frac
+    out += x[:, None]
+    return out.reshape((-1,) + x.shape[1:])
+
+
 def resample_linear(signal: np.ndarray, sr_in: int, sr_out: int) -> np.ndarray:
-    """Resampling linéaire simple (suffisant pour MVP)."""
+    """
+    Resampling vers sr_out.
+    Polyphase FIR (scipy, anti-aliasing, toutes les voies d'un coup) si dispo, sinon linéaire (np.interp).
+    """
     if sr_in == sr_out:
         return signal
     if len(signal) < 2:
         return signal
+    if resample_poly is not None:
+        g = gcd(int(sr_in), int(sr_out))
+        x = np.asarray(signal, dtype=np.float32)
+        return resample_poly(x, int(sr_out) // g, int(sr_in) // g, axis=0).astype(np.float32, copy=False)
+    if sr_in % sr_out == 0:
+        # Décimation entière: simple vue à pas fixe (même repliement que l'interpolation linéaire).
+        return np.ascontiguousarray(signal[:: sr_in // sr_out], dtype=np.float32)
+    if sr_out % sr_in == 0:
+        return _upsample_int(np.asarray(signal, dtype=np.float32), sr_out // sr_in)
     ratio = sr_out / sr_in
     if signal.ndim == 1:
         n_out = int(round(len(signal) * ratio))
         x_in = np.linspace(0.0, 1.0, num=len(signal), endpoint=True)
         x_out = np.linspace(0.0, 1.0, num=n_out, endpoint=True)
-        return np.interp(x_out, x_in, signal).astype(np.float64)
+        return np.interp(x_out, x_in, signal).astype(np.float32)
     # 2D: resample each channel
     n_out = int(round(signal.shape[0] * ratio))
     x_in = np.linspace(0.0, 1.0, num=signal.shape[0], endpoint=True)
     x_out = np.linspace(0.0, 1.0, num=n_out, endpoint=True)
-    out = np.zeros((n_out, signal.shape[1]), dtype=np.float64)
+    out = np.zeros((n_out, signal.shape[1]), dtype=np.float32)
     for ch in range(signal.shape[1]):
         out[:, ch] = np.interp(x_out, x_in, signal[:, ch])
     return out
@@ -2,7 +2,38 @@ from pathlib import Path
 
 import numpy as np
 
-from utils import fade, normalize, save_wave
+from utils import fade, rms_gain, save_wave_stereo
+
+_BLOCK = 4096  # échantillons par bloc (table de base sin/cos)
+_ROWS = 256  # blocs traités par passe (borne le buffer temporaire)
+
+
+def _sine(n: int, freq: float, sr: int) -> np.ndarray:
+    """
+    sin(2*pi*freq*k/sr) pour k < n (float32), sans sin() par échantillon:
+    sin(phi_j + theta_i) = sin(phi_j)*cos(theta_i) + cos(phi_j)*sin(theta_i),
+    theta_i = table du bloc de base, phi_j = phase de début de bloc (float64, réduite modulo 2*pi).
+    => 2 mul + 1 add par échantillon, phase exacte même sur des pistes de plus d'une heure.
+    """
+    nb = max(1, -(-n // _BLOCK))
+    w = 2.0 * np.pi * float(freq) / float(sr)
+    theta = w * np.arange(_BLOCK, dtype=np.float64)
+    sin_b = np.sin(theta).astype(np.float32)
+    cos_b = np.cos(theta).astype(np.float32)
+    phi = np.mod(w * _BLOCK * np.arange(nb, dtype=np.float64), 2.0 * np.pi)
+    sin_p = np.sin(phi).astype(np.float32)[:, None]
+    cos_p = np.cos(phi).astype(np.float32)[:, None]
+
+    out = np.empty((nb, _BLOCK), dtype=np.float32)
+    tmp = np.empty((min(_ROWS, nb), _BLOCK), dtype=np.float32)
+    for r0 in range(0, nb, _ROWS):
+        r1 = min(r0 + _ROWS, nb)
+        o = out[r0:r1]
+        np.multiply(sin_p[r0:r1], cos_b, out=o)
+        t = tmp[: r1 - r0]
+        np.multiply(cos_p[r0:r1], sin_b, out=t)
+        o += t
+    return out.reshape(-1)[:n]
 
 
 def generate_binaural_track(
@@ -20,21 +51,23 @@ def generate_binaural_track(
     """
     duration = max(60, duration_minutes * 60)
     n = int(sample_rate * duration)
-    t = (np.arange(n, dtype=np.float32) / np.float32(sample_rate)).astype(np.float32)
-
-    two_pi = np.float32(2.0 * np.pi)
-    left = np.sin(two_pi * np.float32(carrier_hz) * t).astype(np.float32)
-    right = np.sin(two_pi * np.float32(carrier_hz + beat_hz) * t).astype(np.float32)
+    # float32 partout + opérations in-place: pic RAM 3 pistes (env, L, R).
+    # Enveloppe commune aux deux oreilles (x 0.12)
+    env = _sine(n, 0.1, sample_rate)
+    env *= np.float32(0.4)
+    env += np.float32(0.6)
+    env *= np.float32(0.12)
 
-    # Vrai binaural stéréo: L=carrier, R=carrier+beat
-    envelope = np.float32(0.6) + np.float32(0.4) * np.sin(two_pi * np.float32(0.1) * t)
-    l = (left * envelope * np.float32(0.12)).astype(np.float32)
-    r = (right * envelope * np.float32(0.12)).astype(np.float32)
+    # Vrai binaural stéréo: L=carrier, R=carrier+beat (canaux séparés, SoA)
+    l = _sine(n, carrier_hz, sample_rate)
+    l *= env
+    r = _sine(n, carrier_hz + beat_hz, sample_rate)
+    r *= env
+    del env
 
-    l = fade(l, fade_time=4.0, sr=sample_rate)
-    r = fade(r, fade_time=4.0, sr=sample_rate)
-    stereo = np.stack([l, r], axis=1)
-    stereo = normalize(stereo, target_db=-22.0)
+    fade(l, fade_time=4.0, sr=sample_rate, inplace=True)
+    fade(r, fade_time=4.0, sr=sample_rate, inplace=True)
+    gain = rms_gain((l, r), target_db=-22.0)
 
-    save_wave(stereo, sample_rate, Path(output_path))
+    save_wave_stereo(l, r, sample_rate, Path(output_path), gain=gain)
 
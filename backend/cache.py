@@ -1,31 +1,65 @@
+import functools
 import hashlib
 import json
+import os
 from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Union
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def canonical_json(payload: Dict[str, Any]) -> bytes:
+    """JSON trié et compact (une seule sérialisation: sert à la clé ET à request.json)."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def hash_key(canon: bytes) -> str:
+    """Clé de 16 hex (blake2b, plus rapide que sha256 en pur CPU)."""
+    return hashlib.blake2b(canon, digest_size=8).hexdigest()
 
 
 def stable_cache_key(payload: Dict[str, Any]) -> str:
     """Clé stable basée sur JSON trié (pour réutiliser les sorties)."""
-    dumped = json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")
-    return hashlib.sha256(dumped).hexdigest()[:16]
+    return hash_key(canonical_json(payload))
 
 
 def cache_dir(base_dir: Path) -> Path:
     return base_dir / "assets" / "cache"
 
 
+@functools.lru_cache(maxsize=256)
+def _load_cached(path: str, mtime_ns: int, size: int) -> Dict[str, Any]:
+    # Clé = (chemin, mtime, taille): un save_cached() ultérieur change la clé => relecture.
+    with open(path, "rb") as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
 def try_load_cached(base_dir: Path, key: str) -> Optional[Dict[str, Any]]:
-    p = cache_dir(base_dir) / f"{key}.json"
-    if not p.exists():
+    """Réponse en cache pour `key` (dict partagé en mémoire: ne pas le muter)."""
+    p = str(cache_dir(base_dir) / f"{key}.json")
+    try:
+        st = os.stat(p)
+    except FileNotFoundError:
         return None
-    return json.loads(p.read_text(encoding="utf-8"))
+    return _load_cached(p, st.st_mtime_ns, st.st_size)
 
 
-def save_cached(base_dir: Path, key: str, data: Dict[str, Any]) -> Path:
+def save_cached(base_dir: Path, key: str, data: Union[Dict[str, Any], bytes]) -> Path:
+    """`data` peut être du JSON déjà sérialisé (ex: model_dump_json()), écrit tel quel."""
     d = cache_dir(base_dir)
     d.mkdir(parents=True, exist_ok=True)
     p = d / f"{key}.json"
-    p.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    if isinstance(data, (bytes, bytearray)):
+        p.write_bytes(data)
+    elif orjson is not None:
+        p.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        p.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
     return p
-
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
+import atexit
+import functools
 import json
 import os
+import threading
 from contextlib import contextmanager
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Optional, Tuple
 
 
 def get_database_url() -> str:
@@ -38,17 +41,92 @@ def db_enabled() -> bool:
     return True
 
 
+@functools.lru_cache(maxsize=4)
+def _prepare_enabled(raw_url: str, flag: str) -> bool:
+    """
+    Prepared statements (requêtes state, appelées en boucle par l'UI).
+    Désactivés derrière un pooler en mode transaction (pgbouncer / Supabase :6543): la connexion
+    serveur change à chaque transaction. DB_PREPARE=1/0 force le choix.
+    """
+    flag = flag.strip().lower()
+    if flag in ("1", "true", "yes"):
+        return True
+    if flag in ("0", "false", "no"):
+        return False
+    low = raw_url.lower()
+    return "pgbouncer" not in low and ":6543" not in low
+
+
+def _prepare() -> bool:
+    return _prepare_enabled(os.environ.get("DATABASE_URL", "") or "", os.environ.get("DB_PREPARE", "") or "")
+
+
+_POOL: Any = None
+_POOL_LOCK = threading.Lock()
+
+
+def _get_pool(url: str) -> Any:
+    """
+    Pool de connexions partagé (créé au premier appel).
+    Retourne None si psycopg_pool n'est pas installé (fallback: une connexion par appel).
+    """
+    global _POOL
+    if _POOL is not None:
+        return _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            try:
+                from psycopg_pool import ConnectionPool
+            except Exception:
+                return None
+            min_size = max(0, int(os.environ.get("DB_POOL_MIN_SIZE", "1") or 1))
+            # autocommit pour simplifier (events append + upsert)
+            conn_kwargs: Dict[str, Any] = {"autocommit": True}
+            if not _prepare():
+                # Connexions longues du pool: sans ça psycopg prépare côté serveur toute requête
+                # exécutée 5+ fois, ce qui casse derrière un pooler en mode transaction.
+                conn_kwargs["prepare_threshold"] = None
+            _POOL = ConnectionPool(
+                conninfo=url,
+                min_size=min_size,
+                max_size=max(1, min_size, int(os.environ.get("DB_POOL_MAX_SIZE", "10") or 10)),
+                # Backpressure: attend une connexion libre au plus N s (PoolTimeout) au lieu d'en ouvrir d'autres.
+                timeout=float(os.environ.get("DB_POOL_TIMEOUT", "30") or 30),
+                kwargs=conn_kwargs,
+                # Supabase/poolers drop idle connections: validate on checkout.
+                check=getattr(ConnectionPool, "check_connection", None),
+                open=True,
+            )
+            # Hors serveur (scripts, outils): ferme proprement le pool à la sortie du process.
+            atexit.register(close_pool)
+    return _POOL
+
+
+def close_pool() -> None:
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.close()
+
+
 @contextmanager
 def get_conn():
     """
     Connexion Postgres (Supabase ou autre Postgres).
     - DATABASE_URL doit être défini.
+    - Réutilise une connexion du pool si psycopg_pool est disponible.
     """
     import psycopg
 
     url = get_database_url()
     if not url:
         raise RuntimeError("DATABASE_URL manquant")
+    pool = _get_pool(url)
+    if pool is not None:
+        with pool.connection() as conn:
+            yield conn
+        return
     # autocommit pour simplifier (events append + upsert)
     with psycopg.connect(url, autocommit=True) as conn:
         yield conn
@@ -143,6 +221,8 @@ def init_db() -> None:
             )
             cur.execute("create index if not exists idx_audio_assets_kind on audio_assets(kind);")
             cur.execute("create index if not exists idx_audio_assets_updated_at on audio_assets(updated_at desc);")
+            # Keyset pagination (list_audio_assets cursor)
+            cur.execute("create index if not exists idx_audio_assets_updated_at_id on audio_assets(updated_at desc, id desc);")
             cur.execute("create index if not exists idx_audio_assets_tags_gin on audio_assets using gin(tags);")
 
 
@@ -160,6 +240,7 @@ def upsert_client_state(device_id: str, state: Dict[str, Any]) -> None:
                 do update set state_json = excluded.state_json, updated_at = now();
                 """,
                 (device_id, payload),
+                prepare=_prepare(),
             )
 
 
@@ -225,6 +306,7 @@ def upsert_user_state(user_id: str, state: Dict[str, Any]) -> None:
                 do update set state_json = excluded.state_json, updated_at = now();
                 """,
                 (user_id, payload),
+                prepare=_prepare(),
             )
 
 
@@ -233,7 +315,7 @@ def get_user_state(user_id: str) -> Optional[Dict[str, Any]]:
         return None
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("select state_json from user_state where user_id=%s::uuid", (user_id,))
+            cur.execute("select state_json from user_state where user_id=%s::uuid", (user_id,), prepare=_prepare())
             row = cur.fetchone()
             if not row:
                 return None
@@ -253,7 +335,7 @@ def get_client_state(device_id: str) -> Optional[Dict[str, Any]]:
         return None
     with get_conn() as conn:
         with conn.cursor() as cur:
-            cur.execute("select state_json from client_state where device_id=%s", (device_id,))
+            cur.execute("select state_json from client_state where device_id=%s", (device_id,), prepare=_prepare())
             row = cur.fetchone()
             if not row:
                 return None
@@ -560,13 +642,22 @@ def list_audio_assets(
     tag: Optional[str] = None,
     limit: int = 200,
     offset: int = 0,
+    cursor: Optional[Tuple[str, int]] = None,
 ) -> list[Dict[str, Any]]:
+    """
+    cursor=(updated_at, id) of the last item of the previous page: keyset pagination
+    (constant cost per page, offset is then ignored).
+    """
     if not db_enabled():
         raise RuntimeError("DB disabled")
     limit = max(1, min(int(limit or 200), 1000))
     offset = max(0, int(offset or 0))
     where = []
     params: list[Any] = []
+    if cursor:
+        where.append("(updated_at, id) < (%s::timestamptz, %s)")
+        params.extend([str(cursor[0]), int(cursor[1])])
+        offset = 0
     if kind:
         where.append("kind = %s")
         params.append(str(kind))
@@ -583,7 +674,7 @@ def list_audio_assets(
         select id, storage_key, kind, title, tags, source, license, duration_s, loudness_lufs, notes, extra, created_at, updated_at
         from audio_assets
         {where_sql}
-        order by updated_at desc
+        order by updated_at desc, id desc
         limit {limit} offset {offset};
     """
     with get_conn() as conn:
@@ -593,6 +684,33 @@ def list_audio_assets(
     return [_audio_asset_row_to_dict(r) for r in rows]
 
 
+def count_audio_assets_by_tags(tags: list[str], *, kind: Optional[str] = None) -> Dict[str, int]:
+    """
+    Counts audio assets per tag in a single query (tags missing from the result have 0 assets).
+    """
+    if not db_enabled():
+        raise RuntimeError("DB disabled")
+    wanted = [str(t or "").strip().lower() for t in (tags or []) if str(t or "").strip()]
+    if not wanted:
+        return {}
+    where = ["t = any(%s::text[])"]
+    params: list[Any] = [wanted]
+    if kind:
+        where.append("kind = %s")
+        params.append(str(kind))
+    sql = f"""
+        select t, count(*)
+        from audio_assets, unnest(tags) as t
+        where {' and '.join(where)}
+        group by t;
+    """
+    with get_conn() as conn:
+        with conn.cursor() as cur:
+            cur.execute(sql, tuple(params))
+            rows = cur.fetchall() or []
+    return {str(t): int(c) for (t, c) in rows}
+
+
 def delete_audio_asset(*, storage_key: str) -> bool:
     if not db_enabled():
         raise RuntimeError("DB disabled")
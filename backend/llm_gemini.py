@@ -1,5 +1,6 @@
 import json
 import os
+import re
 from typing import Dict, Optional
 
 import httpx
@@ -9,6 +10,9 @@ GEMINI_API_KEY_ENV = "GEMINI_API_KEY"
 GEMINI_BASE = "https://generativelanguage.googleapis.com/v1beta"
 GEMINI_DEFAULT_MODEL = os.environ.get("GEMINI_MODEL", "gemini-pro-latest")
 
+_RE_KEY_PARAM = re.compile(r"([?&]key=)[^&\s]+")
+_RE_AIZA = re.compile(r"AIza[0-9A-Za-z\-_]{20,}")
+
 def _redact_secrets(s: str) -> str:
     """
     Évite de faire remonter des secrets (ex: ...?key=AIza... ) dans les erreurs renvoyées au frontend.
@@ -16,16 +20,9 @@ def _redact_secrets(s: str) -> str:
     if not s:
         return s
     # Redact query param "key="
-    try:
-        import re
-
-        s = re.sub(r"([?&]key=)[^&\s]+", r"\1REDACTED", s)
-        # Redact common Google API key pattern if ever present outside query
-        s = re.sub(r"AIza[0-9A-Za-z\-_]{20,}", "AIzaREDACTED", s)
-    except Exception:
-        # Best effort only
-        pass
-    return s
+    s = _RE_KEY_PARAM.sub(r"\1REDACTED", s)
+    # Redact common Google API key pattern if ever present outside query
+    return _RE_AIZA.sub("AIzaREDACTED", s)
 
 
 class GeminiConfigError(RuntimeError):
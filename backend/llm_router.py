@@ -1,16 +1,20 @@
-from typing import Dict
+from typing import Dict, Optional, Tuple
 
 from models import GenerationRequest
-from llm import generate_text_sections
+from llm import DEFAULT_SECTIONS, generate_text_sections
 from llm_gemini import generate_text_sections_gemini
 
 
-async def generate_sections(prompt: str, req: GenerationRequest) -> Dict[str, str]:
+async def generate_sections(prompt: str, req: GenerationRequest) -> Tuple[Dict[str, str], bool, Optional[str]]:
     """
     Route la génération vers Ollama (local) ou Gemini (cloud), selon req.llm_provider.
+    Renvoie (sections, fallback, erreur): fallback=True si le texte par défaut a été utilisé.
     """
     if req.llm_provider == "gemini":
-        return await generate_text_sections_gemini(prompt, model=req.gemini_model)
-    return await generate_text_sections(prompt)
-
-
+        sections = await generate_text_sections_gemini(prompt, model=req.gemini_model)
+    else:
+        sections = await generate_text_sections(prompt)
+    # Ollama ne lève pas: il renvoie DEFAULT_SECTIONS si l'appel ou le parsing échoue.
+    if sections is DEFAULT_SECTIONS:
+        return sections, True, "LLM output not parsable; using DEFAULT_SECTIONS"
+    return sections, False, None
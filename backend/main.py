@@ -13,7 +13,8 @@ from starlette.responses import Response
 from api import router as api_router
 import api as api_module
 import llm as llm_module
-from db import init_db
+from db import close_pool, init_db
+import state_writer
 
 IS_FROZEN = bool(getattr(sys, "frozen", False))
 
@@ -43,6 +44,8 @@ app = FastAPI(
     title="Hypnotic AI",
     description="MVP local de génération de sessions hypnotiques (texte + audio).",
     version="0.1.0",
+    # Même classe que le router API (ORJSONResponse si orjson est installé).
+    default_response_class=api_module.router.default_response_class,
 )
 
 # Security headers
@@ -131,6 +134,37 @@ class SimpleRateLimitMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(SimpleRateLimitMiddleware)
 
+
+@app.on_event("startup")
+async def _size_threadpool():
+    # Les endpoints `def` (fichiers, DB) tournent dans le pool anyio (40 threads par défaut).
+    # Majoritairement de l'I/O: on l'agrandit pour éviter la famine sous charge.
+    try:
+        import anyio.to_thread
+
+        size = int(os.environ.get("THREADPOOL_SIZE", "100") or 100)
+        anyio.to_thread.current_default_thread_limiter().total_tokens = max(1, size)
+    except Exception:
+        pass
+
+
+@app.on_event("shutdown")
+def _close_db_pool():
+    try:
+        close_pool()
+    except Exception:
+        pass
+
+
+@app.on_event("shutdown")
+def _flush_state_files():
+    # Écritures /state en attente (debounce) => disque avant l'arrêt
+    try:
+        state_writer.force_flush()
+    except Exception:
+        pass
+
+
 # Initialise DB (Supabase/Postgres) si DATABASE_URL est défini
 try:
     init_db()
@@ -2,7 +2,7 @@ from pathlib import Path
 
 import numpy as np
 
-from utils import fade, normalize, save_wave
+from utils import fade, rms_gain, save_wave_stereo
 
 
 def generate_music_bed(duration_minutes: int, output_path: str, sample_rate: int = 8000) -> None:
@@ -13,30 +13,52 @@ def generate_music_bed(duration_minutes: int, output_path: str, sample_rate: int
     duration = max(60, duration_minutes * 60)
     n = int(sample_rate * duration)
     # np.linspace crée souvent des float64 (gros RAM). Ici on évite.
-    t = (np.arange(n, dtype=np.float32) / np.float32(sample_rate)).astype(np.float32)
+    # float32 + un seul buffer de travail réutilisé (out=): pic RAM ~4 pistes (t, L, R, tmp).
+    t = np.arange(n, dtype=np.float32)
+    t /= np.float32(sample_rate)
 
     two_pi = np.float32(2.0 * np.pi)
     left = np.zeros(n, dtype=np.float32)
     right = np.zeros(n, dtype=np.float32)
+    tmp = np.empty(n, dtype=np.float32)
+
+    # t et tmp passés en argument (pas de fermeture): les "tmp *= ..." restent locaux et le del plus bas est sûr.
+    def add_layer(
+        out: np.ndarray, t: np.ndarray, tmp: np.ndarray, f0: float, amp: float, drift_hz: float, drift_phase: float
+    ) -> None:
+        # out += amp * sin(2pi * (f0 + 0.4 * sin(2pi * drift_hz * t + drift_phase)) * t)
+        np.multiply(t, two_pi * np.float32(drift_hz), out=tmp)
+        tmp += np.float32(drift_phase)
+        np.sin(tmp, out=tmp)
+        tmp *= np.float32(0.4)
+        tmp += np.float32(f0)
+        tmp *= two_pi
+        tmp *= t
+        np.sin(tmp, out=tmp)
+        tmp *= np.float32(amp)
+        out += tmp
+
+    def add_shimmer(out: np.ndarray, t: np.ndarray, tmp: np.ndarray, hz: float, phase: float) -> None:
+        np.multiply(t, two_pi * np.float32(hz), out=tmp)
+        tmp += np.float32(phase)
+        np.sin(tmp, out=tmp)
+        tmp *= np.float32(0.02)
+        out += tmp
 
     # accords graves simples, 2 couches pour limiter la RAM
     base_freqs = [55.0, 110.0]
     amps = [0.08, 0.05]
     for i, (f0, amp) in enumerate(zip(base_freqs, amps)):
-        drift_l = np.float32(0.4) * np.sin(two_pi * np.float32(0.01) * t + np.float32(i))
-        drift_r = np.float32(0.4) * np.sin(two_pi * np.float32(0.011) * t + np.float32(i) + np.float32(0.7))
-        left += (np.sin(two_pi * (np.float32(f0) + drift_l) * t) * np.float32(amp)).astype(np.float32)
-        right += (np.sin(two_pi * (np.float32(f0) + drift_r) * t) * np.float32(amp)).astype(np.float32)
-
-    shimmer_l = np.float32(0.02) * np.sin(two_pi * np.float32(1.5) * t)
-    shimmer_r = np.float32(0.02) * np.sin(two_pi * np.float32(1.53) * t + np.float32(0.25))
-    left += shimmer_l.astype(np.float32)
-    right += shimmer_r.astype(np.float32)
-
-    left = fade(left, fade_time=5.0, sr=sample_rate)
-    right = fade(right, fade_time=5.0, sr=sample_rate)
-    stereo = np.stack([left, right], axis=1)
-    stereo = normalize(stereo, target_db=-20.0)
-
-    save_wave(stereo, sample_rate, Path(output_path))
+        add_layer(left, t, tmp, f0, amp, 0.01, float(i))
+        add_layer(right, t, tmp, f0, amp, 0.011, float(i) + 0.7)
+
+    add_shimmer(left, t, tmp, 1.5, 0.0)
+    add_shimmer(right, t, tmp, 1.53, 0.25)
+    del tmp, t
+
+    fade(left, fade_time=5.0, sr=sample_rate, inplace=True)
+    fade(right, fade_time=5.0, sr=sample_rate, inplace=True)
+    gain = rms_gain((left, right), target_db=-20.0)
+
+    save_wave_stereo(left, right, sample_rate, Path(output_path), gain=gain)
 
@@ -1,3 +1,5 @@
+import functools
+
 from models import GenerationRequest
 
 PNL_PHRASES = [
@@ -17,6 +19,10 @@ def build_prompt(req: GenerationRequest) -> str:
     Construit un prompt détaillé pour guider Llama 3 afin d'obtenir
     un JSON structuré par phases avec les formulations PNL obligatoires.
     """
+    return _default_prompt(req.objectif, req.duree_minutes, req.style)
+
+
+def _default_prompt(objectif, duree_minutes, style) -> str:
     pnl_clause = "; ".join(PNL_PHRASES)
     return f"""
 Tu es un hypnothérapeute expert. Produis un JSON STRICT, sans texte avant/après, sans Markdown, sans ```.
@@ -32,9 +38,9 @@ Respecte STRICTEMENT les clés et le type:
 
 Contraintes:
 - Langue: français, ton chaleureux, permissif.
-- Objectif: {req.objectif}.
-- Durée totale cible: {req.duree_minutes} minutes.
-- Style: {req.style}.
+- Objectif: {objectif}.
+- Durée totale cible: {duree_minutes} minutes.
+- Style: {style}.
 - Chaque phase doit inclure explicitement les formulations PNL suivantes (au moins 4 par phase): {pnl_clause}.
 - Phases:
   1) Induction: respiration, détente progressive, métaphores lentes.
@@ -61,23 +67,33 @@ def build_prompt_with_overrides(
       Available placeholders:
         {objectif}, {duree_minutes}, {style}, {pnl_clause}
     """
+    return _cached_prompt(
+        req.objectif,
+        req.duree_minutes,
+        req.style,
+        (safety_rules_text or "").strip(),
+        (prompt_template_override or "").strip(),
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_prompt(objectif, duree_minutes, style, safety: str, tpl: str) -> str:
+    """Prompt mémoïsé: ne dépend que de ces champs et de la config admin (passée en clé)."""
     pnl_clause = "; ".join(PNL_PHRASES)
-    safety = (safety_rules_text or "").strip()
-    tpl = (prompt_template_override or "").strip()
 
     if tpl:
         try:
             base = tpl.format(
-                objectif=req.objectif,
-                duree_minutes=req.duree_minutes,
-                style=req.style,
+                objectif=objectif,
+                duree_minutes=duree_minutes,
+                style=style,
                 pnl_clause=pnl_clause,
             )
         except Exception:
             # If formatting fails, fallback to default prompt
-            base = build_prompt(req)
+            base = _default_prompt(objectif, duree_minutes, style)
     else:
-        base = build_prompt(req)
+        base = _default_prompt(objectif, duree_minutes, style)
 
     if safety:
         base = base.rstrip() + "\n\nContraintes sécurité (admin, prioritaire):\n" + safety + "\n"
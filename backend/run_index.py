@@ -0,0 +1,204 @@
+"""
+Index des runs par utilisateur: assets/runs/_index/<user_id>.jsonl
+
+Une ligne par run (champs renvoyés par /runs) + des "tombstones" {"run_id", "deleted": true}.
+Permet à /runs de lire un seul fichier au lieu de scanner tous les dossiers de runs.
+
+Invariant: si le fichier d'index existe, il est complet (construit par un scan complet au
+premier listing); /generate n'y ajoute une ligne que s'il existe déjà. Reconstruction et ajout
+sont sérialisés entre workers par un verrou sentinelle (<user_id>.lock); un ajout en échec
+supprime l'index (invalidate) pour forcer un nouveau scan.
+"""
+
+import functools
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
+
+try:
+    import fcntl  # type: ignore  # POSIX only (plusieurs workers uvicorn)
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+_LOCK = threading.RLock()
+_SAFE_ID = re.compile(r"[^A-Za-z0-9_.-]")
+
+# Compaction quand les lignes mortes dépassent ce seuil (et la moitié du fichier).
+_COMPACT_MIN_DEAD = 64
+
+
+def _dumps(obj: Dict[str, Any]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(raw: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def index_path(base_dir: Path, user_id: str) -> Path:
+    return base_dir / "assets" / "runs" / "_index" / f"{_SAFE_ID.sub('_', str(user_id))}.jsonl"
+
+
+class _FileLock:
+    """Verrou process (threading) + verrou fichier (flock) si disponible."""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        _LOCK.acquire()
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+            except Exception:
+                pass
+        return self.f
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            try:
+                fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+            except Exception:
+                pass
+        _LOCK.release()
+
+
+@contextmanager
+def _index_guard(p: Path) -> Iterator[None]:
+    """
+    Verrou sentinelle (flock sur <index>.lock, stable: jamais remplacé) autour de la reconstruction
+    et des ajouts: un /generate d'un autre worker attend la fin du scan au lieu d'être perdu.
+    """
+    p.parent.mkdir(parents=True, exist_ok=True)
+    with open(p.with_suffix(".lock"), "ab") as f, _FileLock(f):
+        yield
+
+
+def _same_file(f, p: Path) -> bool:
+    # Une compaction (os.replace) d'un autre process a pu remplacer le fichier pendant l'attente du verrou.
+    try:
+        return os.fstat(f.fileno()).st_ino == os.stat(p).st_ino
+    except OSError:
+        return False
+
+
+def _parse(raw: bytes) -> List[Dict[str, Any]]:
+    """Applique les tombstones; renvoie les entrées vivantes (ordre d'insertion)."""
+    live: Dict[str, Dict[str, Any]] = {}
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            e = _loads(line)
+        except Exception:
+            continue
+        rid = str((e or {}).get("run_id") or "")
+        if not rid:
+            continue
+        if e.get("deleted"):
+            live.pop(rid, None)
+        else:
+            live[rid] = e
+    return list(live.values())
+
+
+def append_run(base_dir: Path, user_id: str, entry: Dict[str, Any]) -> None:
+    """Ajoute un run à l'index (no-op si l'index n'a pas encore été construit)."""
+    p = index_path(base_dir, user_id)
+    with _index_guard(p):
+        for _ in range(3):
+            if not p.exists():
+                return
+            with open(p, "ab") as f, _FileLock(f):
+                if _same_file(f, p):
+                    f.write(_dumps(entry) + b"\n")
+                    return
+
+
+def remove_run(base_dir: Path, user_id: str, run_id: str) -> None:
+    """Tombstone + compaction si l'index contient trop de lignes mortes."""
+    p = index_path(base_dir, user_id)
+    with _LOCK:
+        for _ in range(3):
+            if not p.exists():
+                return
+            with open(p, "r+b") as f, _FileLock(f):
+                if not _same_file(f, p):
+                    continue
+                f.seek(0, os.SEEK_END)
+                f.write(_dumps({"run_id": run_id, "deleted": True}) + b"\n")
+                f.flush()
+                f.seek(0)
+                raw = f.read()
+                total = raw.count(b"\n")
+                live = _parse(raw)
+                dead = total - len(live)
+                if dead >= _COMPACT_MIN_DEAD and dead * 2 >= total:
+                    _write_atomic(p, live)
+                return
+
+
+def invalidate(base_dir: Path, user_id: str) -> None:
+    """Supprime l'index (ex: ajout en échec): le prochain /runs refait un scan complet."""
+    p = index_path(base_dir, user_id)
+    with _index_guard(p):
+        try:
+            p.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _write_atomic(p: Path, entries: List[Dict[str, Any]]) -> None:
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(p.name + f".tmp{os.getpid()}")
+    tmp.write_bytes(b"".join(_dumps(e) + b"\n" for e in entries))
+    os.replace(tmp, p)
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_cached(path: str, ino: int, mtime_ns: int, size: int) -> Tuple[Dict[str, Any], ...]:
+    # Clé = stat du fichier: tout append/compaction change size/mtime/inode => relecture.
+    with open(path, "rb") as f:
+        return tuple(_parse(f.read()))
+
+
+def _read_index(p: Path) -> List[Dict[str, Any]]:
+    st = os.stat(p)
+    return list(_parse_cached(str(p), st.st_ino, st.st_mtime_ns, st.st_size))
+
+
+def list_runs(
+    base_dir: Path,
+    user_id: str,
+    *,
+    rebuild: Callable[[], List[Dict[str, Any]]],
+) -> List[Dict[str, Any]]:
+    """
+    Runs vivants de l'utilisateur (non triés; les dicts sont partagés avec le cache: ne pas les modifier).
+    Si l'index n'existe pas, il est construit une fois via `rebuild()` (scan complet).
+    """
+    p = index_path(base_dir, user_id)
+    try:
+        return _read_index(p)
+    except FileNotFoundError:
+        pass
+    with _index_guard(p):
+        # Sous verrou (tous workers): un /generate concurrent attend la fin du scan avant d'ajouter sa ligne.
+        if p.exists():
+            return _read_index(p)
+        entries = rebuild()
+        _write_atomic(p, entries)
+    return entries
@@ -0,0 +1,90 @@
+"""
+Écritures différées des fichiers d'état (assets/state/<device_id>.json).
+
+Les POST /state rapprochés (sliders, autosave) pour un même fichier sont fusionnés:
+seul le dernier contenu est écrit, après une courte fenêtre (~200 ms), via tmp + os.replace
+(jamais de JSON à moitié écrit en cas de crash).
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger("hypnotic_ai.state_writer")
+
+_DELAY_S = 0.2
+_RETRY_MAX_S = 30.0
+
+_LOCK = threading.Lock()
+_FLUSH_LOCK = threading.Lock()  # un seul flush à la fois (timer vs shutdown): pas d'écriture périmée
+_PENDING: Dict[str, bytes] = {}
+_TIMER: Optional[threading.Timer] = None
+_FAILS = 0  # flushs consécutifs en échec (backoff des nouvelles tentatives)
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _arm(delay: float) -> None:
+    # Appelé sous _LOCK.
+    global _TIMER
+    _TIMER = threading.Timer(delay, _flush)
+    _TIMER.daemon = True
+    _TIMER.start()
+
+
+def _flush() -> None:
+    global _TIMER, _FAILS
+    with _FLUSH_LOCK:
+        with _LOCK:
+            batch = dict(_PENDING)
+            _TIMER = None
+        failed = False
+        for path, data in batch.items():
+            try:
+                _write_atomic(path, data)
+            except Exception:
+                logger.exception("State write failed for %s; will retry", path)
+                failed = True
+                continue
+            with _LOCK:
+                # Ne retire que si aucune version plus récente n'est arrivée entre-temps.
+                if _PENDING.get(path) is data:
+                    del _PENDING[path]
+        with _LOCK:
+            _FAILS = _FAILS + 1 if failed else 0
+            # Échec: les données restent dans _PENDING, on replanifie (backoff) sans attendre un autre POST.
+            if failed and _PENDING and _TIMER is None:
+                _arm(min(_RETRY_MAX_S, _DELAY_S * (2 ** _FAILS)))
+
+
+def enqueue(fp: Path, data: bytes) -> None:
+    """Programme l'écriture de `data` dans `fp` (remplace une écriture en attente)."""
+    with _LOCK:
+        _PENDING[str(fp)] = data
+        if _TIMER is None:
+            _arm(_DELAY_S)
+
+
+def pending(fp: Path) -> Optional[bytes]:
+    """Contenu pas encore écrit pour `fp` (lecture cohérente juste après un POST)."""
+    with _LOCK:
+        return _PENDING.get(str(fp))
+
+
+def force_flush() -> None:
+    """Écrit tout de suite ce qui est en attente (shutdown)."""
+    global _TIMER
+    with _LOCK:
+        t, _TIMER = _TIMER, None
+    if t is not None:
+        t.cancel()
+    _flush()
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import functools
 import os
+import threading
 import time
-from typing import Any, Dict, List, Optional, Tuple
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
 
 import httpx
 
@@ -32,12 +34,14 @@ def _auth_headers() -> Dict[str, str]:
     }
 
 
+@functools.lru_cache(maxsize=1)
 def expected_audio_paths() -> Dict[str, Dict[str, str]]:
     """
     Convention-based expected object keys in Supabase Storage bucket.
     Used by:
       - cloud catalog builder (signed URLs)
       - admin UI helper (upload/rename suggestions)
+    Constant: computed once and shared (do not mutate).
     """
     music_paths = {
         "user-slowlife": "music/user/slowlife.mp3",
@@ -105,9 +109,16 @@ def list_objects(prefix: str = "", *, limit: int = 200, offset: int = 0) -> List
     return []
 
 
-def upload_object(key: str, content: bytes, *, content_type: str = "audio/mpeg", upsert: bool = True) -> Dict[str, Any]:
+def upload_object(
+    key: str,
+    content: Union[bytes, IO[bytes]],
+    *,
+    content_type: str = "audio/mpeg",
+    upsert: bool = True,
+) -> Dict[str, Any]:
     """
-    Upload bytes to Supabase Storage (service role). Returns {ok, key, status, error?}
+    Upload bytes (or a binary file object, streamed from its current position) to Supabase Storage
+    (service role). Returns {ok, key, status, error?}
     """
     if not storage_enabled():
         return {"ok": False, "error": "Storage disabled"}
@@ -120,6 +131,12 @@ def upload_object(key: str, content: bytes, *, content_type: str = "audio/mpeg",
         # Supabase Storage supports x-upsert for overwrite.
         "x-upsert": "true" if upsert else "false",
     }
+    if not isinstance(content, (bytes, bytearray)):
+        # File object: send an explicit length so httpx streams it without chunked encoding.
+        pos = content.tell()
+        content.seek(0, os.SEEK_END)
+        headers["Content-Length"] = str(content.tell() - pos)
+        content.seek(pos)
     try:
         with httpx.Client(timeout=60.0) as client:
             res = client.post(url, headers=headers, content=content)
@@ -145,6 +162,7 @@ def move_object(source_key: str, dest_key: str) -> Dict[str, Any]:
             res = client.post(url, headers=_auth_headers(), json=payload)
             if res.status_code >= 400:
                 return {"ok": False, "source": src, "dest": dst, "status": res.status_code, "error": (res.text or "")[:400]}
+            _forget_signed(src, dst)
             return {"ok": True, "source": src, "dest": dst}
     except Exception as e:
         return {"ok": False, "source": src, "dest": dst, "error": str(e)}
@@ -167,11 +185,20 @@ def delete_object(key: str) -> Dict[str, Any]:
             res = client.delete(url, headers=headers)
             if res.status_code >= 400:
                 return {"ok": False, "key": k, "status": res.status_code, "error": (res.text or "")[:400]}
+            _forget_signed(k)
             return {"ok": True, "key": k}
     except Exception as e:
         return {"ok": False, "key": k, "error": str(e)}
 
 
+# Signed URLs per (base_url, bucket, path, expires_in) -> (reuse_until, url).
+# A URL is reused for half its lifetime so clients always get at least expires_in/2 of validity.
+_SIGNED_CACHE: Dict[Tuple[str, str, str, int], Tuple[float, str]] = {}
+_SIGNED_CACHE_MAX = 2048
+# sign_url runs in worker threads (to_thread): every read, insert and purge holds this lock.
+_SIGNED_LOCK = threading.Lock()
+
+
 def sign_url(path: str, *, expires_in: int = 3600) -> Optional[str]:
     """
     Génère une URL signée Supabase Storage pour un objet privé.
@@ -185,6 +212,29 @@ def sign_url(path: str, *, expires_in: int = 3600) -> Optional[str]:
         return None
 
     expires_in = max(60, min(int(expires_in or 3600), 24 * 3600))
+    now = time.time()
+    ck = (_base_url(), _bucket(), path, expires_in)
+    with _SIGNED_LOCK:
+        hit = _SIGNED_CACHE.get(ck)
+    if hit and hit[0] > now:
+        return hit[1]
+
+    signed_url = _sign_url_uncached(path, expires_in)
+    if signed_url:
+        with _SIGNED_LOCK:
+            if len(_SIGNED_CACHE) >= _SIGNED_CACHE_MAX:
+                _SIGNED_CACHE.clear()
+            _SIGNED_CACHE[ck] = (now + expires_in / 2, signed_url)
+    return signed_url
+
+
+def _forget_signed(*paths: str) -> None:
+    with _SIGNED_LOCK:
+        for ck in [ck for ck in _SIGNED_CACHE if ck[2] in paths]:
+            del _SIGNED_CACHE[ck]
+
+
+def _sign_url_uncached(path: str, expires_in: int) -> Optional[str]:
     url = f"{_base_url()}/storage/v1/object/sign/{_bucket()}/{path}"
 
     try:
@@ -232,6 +282,7 @@ def build_default_catalog() -> Dict[str, Any]:
         return cached
 
     expires = int(_env("SUPABASE_SIGNED_URL_EXPIRES") or 3600)
+    enabled = storage_enabled()
 
     exp = expected_audio_paths()
     music_paths = exp.get("music") or {}
@@ -264,8 +315,8 @@ def build_default_catalog() -> Dict[str, Any]:
             ambiences["feu"] = u
 
     data = {
-        "enabled": storage_enabled(),
-        "bucket": _bucket() if storage_enabled() else None,
+        "enabled": enabled,
+        "bucket": _bucket() if enabled else None,
         "signed_expires_in": expires,
         "music": music,
         "ambiences": ambiences,
@@ -3,10 +3,10 @@ import math
 import os
 import wave
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Optional, Sequence, Tuple, Union
 
 import numpy as np
-from utils import ensure_parent, fade, normalize, save_wave
+from utils import copy_file_fast, ensure_parent, fade, normalize, save_wave
 
 
 def _text_to_duration_seconds(text: str, words_per_minute: int = 110) -> float:
@@ -118,13 +118,27 @@ def _elevenlabs_tts_to_wav(
         else:
             _wrap_pcm_to_wav(data, 22050, out_path)
 
-def tts_cache_key(full_text: str, provider: str, voice_id: str = "", extra: Optional[dict] = None) -> str:
+def tts_cache_key(
+    full_text: Union[str, Sequence[str]], provider: str, voice_id: str = "", extra: Optional[dict] = None
+) -> str:
+    """
+    Clé du cache TTS (24 hex, sha256 tronqué: inchangée pour les voice_*.wav existants).
+    `full_text` peut être la liste des sections: hachées une à une (séparées par " "),
+    même clé que le texte joint, sans le construire.
+    """
     extra = extra or {}
-    dumped = (provider + "|" + voice_id + "|" + full_text + "|" + repr(sorted(extra.items()))).encode("utf-8")
-    return hashlib.sha256(dumped).hexdigest()[:24]
+    parts = [full_text] if isinstance(full_text, str) else full_text
+    h = hashlib.sha256()
+    h.update((provider + "|" + voice_id + "|").encode("utf-8"))
+    for i, part in enumerate(parts):
+        if i:
+            h.update(b" ")
+        h.update(part.encode("utf-8"))
+    h.update(("|" + repr(sorted(extra.items()))).encode("utf-8"))
+    return h.hexdigest()[:24]
 
 def synthesize_tts_cached(
-    full_text: str,
+    full_text: Union[str, Sequence[str]],
     output_path: str,
     *,
     provider: str = "local",
@@ -145,9 +159,13 @@ def synthesize_tts_cached(
         key = tts_cache_key(full_text, provider, elevenlabs_voice_id, eleven_params if provider == "elevenlabs" else {})
         cache_file = cache_dir / f"voice_{key}.wav"
         if cache_file.exists():
-            out_path.write_bytes(cache_file.read_bytes())
+            copy_file_fast(cache_file, out_path)
             return True, provider, None
 
+    # Cache miss seulement: texte complet pour le moteur TTS.
+    if not isinstance(full_text, str):
+        full_text = " ".join(full_text)
+
     try:
         if provider == "elevenlabs":
             _elevenlabs_tts_to_wav(full_text, out_path, elevenlabs_voice_id, **eleven_params)
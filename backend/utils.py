@@ -1,3 +1,6 @@
+import os
+import shutil
+import threading
 import wave
 from pathlib import Path
 from typing import Tuple
@@ -9,6 +12,40 @@ def ensure_parent(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
+def copy_file_fast(src: Path, dst: Path) -> None:
+    """
+    Copie src -> dst sans passer les octets par l'espace utilisateur:
+    - hardlink (même FS): aucune copie, remplacement atomique de dst
+    - sinon os.copy_file_range (copie in-kernel, Linux)
+    - sinon shutil.copyfile
+    """
+    ensure_parent(dst)
+    tmp = dst.with_name(f"{dst.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        os.link(src, tmp)
+        os.replace(tmp, dst)
+        return
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as s, open(dst, "wb") as d:
+                remaining = os.fstat(s.fileno()).st_size
+                while remaining > 0:
+                    n = os.copy_file_range(s.fileno(), d.fileno(), remaining)
+                    if n <= 0:
+                        break
+                    remaining -= n
+            if remaining <= 0:
+                return
+        except OSError:
+            pass
+    shutil.copyfile(str(src), str(dst))
+
+
 def save_wave(signal: np.ndarray, sample_rate: int, path: Path) -> None:
     """
     Enregistre un signal mono/stéréo float [-1,1] en WAV PCM 16-bit.
@@ -37,13 +74,50 @@ def save_wave(signal: np.ndarray, sample_rate: int, path: Path) -> None:
             wav_file.writeframes(int16.tobytes())
 
 
-def fade(signal: np.ndarray, fade_time: float, sr: int) -> np.ndarray:
-    """Applique un fade in/out simple."""
+def save_wave_stereo(left: np.ndarray, right: np.ndarray, sample_rate: int, path: Path, gain: float = 1.0) -> None:
+    """
+    Comme save_wave pour 2 canaux séparés (SoA): gain + clip + int16 + entrelacement par chunk,
+    sans np.stack ni copie clippée de toute la piste.
+    """
+    ensure_parent(path)
+    n = min(len(left), len(right))
+    g = np.float32(gain)
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        chunk_size = 1_000_000  # frames
+        buf = np.empty((min(chunk_size, max(n, 1)), 2), dtype=np.float32)
+        for start in range(0, n, chunk_size):
+            m = min(chunk_size, n - start)
+            b = buf[:m]
+            b[:, 0] = left[start : start + m]
+            b[:, 1] = right[start : start + m]
+            b *= g
+            np.clip(b, -1.0, 1.0, out=b)
+            b *= np.float32(32767)
+            wav_file.writeframes(b.astype(np.int16).tobytes())
+
+
+def rms_gain(channels: Tuple[np.ndarray, ...], target_db: float) -> float:
+    """Gain de normalize() (RMS global vers target_db) calculé sur des canaux séparés."""
+    size = sum(int(c.size) for c in channels)
+    if size == 0:
+        return 1.0
+    energy = sum(float(np.dot(c, c)) for c in channels)
+    rms = float(np.sqrt((energy / float(size)) + 1e-9))
+    if rms == 0.0:
+        return 1.0
+    return float(10 ** (target_db / 20)) / rms
+
+
+def fade(signal: np.ndarray, fade_time: float, sr: int, inplace: bool = False) -> np.ndarray:
+    """Applique un fade in/out simple (inplace=True: modifie `signal`, pas de copie pleine longueur)."""
     n = int(fade_time * sr)
     if n == 0 or n * 2 > len(signal):
         return signal
-    window = np.linspace(0.0, 1.0, n)
-    out = signal.copy()
+    window = np.linspace(0.0, 1.0, n, dtype=signal.dtype if inplace else None)
+    out = signal if inplace else signal.copy()
     out[:n] *= window
     out[-n:] *= window[::-1]
     return out